@@ -1,26 +1,160 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import base64
-import requests
 import json
 import time
 from datetime import datetime
 import re
 import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
-import ebooklib
-from ebooklib import epub
 import tempfile
 import os
+import socket
+import threading
+import queue
+import uuid
+import random
+from email.utils import parsedate_to_datetime
+import sqlite3
+import secrets
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import functools
+import gzip
+import zlib
+from collections import deque, OrderedDict
+import hashlib
+import asyncio
+import logging
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookiejar import DefaultCookiePolicy
+from types import SimpleNamespace
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 DEFAULT_WEBHOOK_URL = "https://agentonline-u29564.vm.elestio.app/webhook-test/61e8b566-40c1-4925-940b-c6e74b9563cc"
 
+# HTTP connection pool settings (override per deployment via environment)
+HTTP_POOL_CONNECTIONS = int(os.environ.get("BOOKBUDDY_POOL_CONNECTIONS", "10"))  # distinct hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.environ.get("BOOKBUDDY_POOL_MAXSIZE", "20"))  # connections kept per host
+HTTP_POOL_BLOCK = os.environ.get("BOOKBUDDY_POOL_BLOCK", "true").lower() == "true"  # enforce per-host limit
+HTTP_KEEPALIVE_IDLE = int(os.environ.get("BOOKBUDDY_KEEPALIVE_IDLE", "60"))  # seconds before TCP keep-alive probes
+
+# Upload transports for audio files
+UPLOAD_TRANSPORTS = {
+    'json': 'JSON (base64 audio_data)',
+    'multipart': 'Multipart form-data (streamed)',
+    'binary': 'Raw binary (metadata in headers)'
+}
+UPLOAD_CHUNK_SIZE = 256 * 1024  # bytes read from the upload buffer per chunk
+
+# JSON request bodies: serializer ('orjson' when installed, else 'json') and optional compression
+JSON_SERIALIZER = os.environ.get("BOOKBUDDY_JSON_SERIALIZER", "orjson" if orjson is not None else "json")
+REQUEST_ENCODING = os.environ.get("BOOKBUDDY_REQUEST_ENCODING", "identity")  # identity, gzip, deflate or zstd
+REQUEST_COMPRESSION_LEVEL = int(os.environ.get("BOOKBUDDY_COMPRESSION_LEVEL", "6"))
+# Bodies smaller than the threshold are sent as-is
+REQUEST_COMPRESSION_THRESHOLD = int(os.environ.get("BOOKBUDDY_COMPRESSION_THRESHOLD", "4096"))
+ENCODING_REJECTION_TTL = 3600  # seconds a URL that rejected compressed bodies is sent plain bodies
+
+# Duplicate suppression: the same audio sent to the same URL again within the TTL is skipped
+DEDUP_TTL = int(os.environ.get("BOOKBUDDY_DEDUP_TTL", "900"))  # seconds a delivered recording is remembered, 0 disables
+DEDUP_MAX_ENTRIES = int(os.environ.get("BOOKBUDDY_DEDUP_ENTRIES", "1000"))  # delivered recordings remembered
+DEDUP_WAIT = 120  # seconds a duplicate waits for an identical send in flight before sending anyway
+IDEMPOTENCY_KEYS = os.environ.get("BOOKBUDDY_IDEMPOTENCY_KEYS", "false").lower() == "true"  # send Idempotency-Key
+
+# Additional endpoints every delivery is fanned out to (comma-separated), e.g. archival and transcription flows
+FANOUT_URLS = [url.strip() for url in os.environ.get("BOOKBUDDY_FANOUT_URLS", "").split(",") if url.strip()]
+
+# Background delivery queue
+WEBHOOK_WORKERS = int(os.environ.get("BOOKBUDDY_WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("BOOKBUDDY_WEBHOOK_QUEUE_SIZE", "100"))  # pending jobs before back-pressure
+WEBHOOK_JOB_RETENTION = 3600  # seconds an uncollected result is kept
+BATCH_UPLOAD_CONCURRENCY = int(os.environ.get("BOOKBUDDY_BATCH_CONCURRENCY", "3"))  # files of one batch sent at once
+
+# Delivery metrics (served at /metrics on the ingest port, optionally also written to a file)
+METRICS_FILE = os.environ.get("BOOKBUDDY_METRICS_FILE", "")  # Prometheus textfile-collector path
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds
+TIMING_PHASES = ('hash', 'encode', 'serialize', 'compress', 'connect', 'tls', 'ttfb', 'total')
+
+# Response history
+WEBHOOK_HISTORY_SIZE = int(os.environ.get("BOOKBUDDY_HISTORY_SIZE", "200"))  # deliveries kept per history
+WEBHOOK_HISTORY_SHARED = os.environ.get("BOOKBUDDY_HISTORY_SHARED", "false").lower() == "true"  # one for all sessions
+WEBHOOK_HISTORY_TEXT = 200  # characters of response body kept per delivery
+
+# Retry policy and circuit breaker
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("BOOKBUDDY_MAX_ATTEMPTS", "4"))
+WEBHOOK_BACKOFF_BASE = float(os.environ.get("BOOKBUDDY_BACKOFF_BASE", "0.5"))  # seconds
+WEBHOOK_BACKOFF_MAX = float(os.environ.get("BOOKBUDDY_BACKOFF_MAX", "30"))  # seconds
+WEBHOOK_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("BOOKBUDDY_CIRCUIT_FAILURES", "5"))  # consecutive failures
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("BOOKBUDDY_CIRCUIT_RESET", "30"))  # seconds before probing again
+CIRCUIT_MAX_BREAKERS = 1024  # URLs whose breaker is kept; the least recently used healthy ones go first
+
+# Durable outbox for undelivered payloads
+OUTBOX_PATH = os.environ.get(
+    "BOOKBUDDY_OUTBOX_PATH", os.path.join(os.path.expanduser("~"), ".book_buddy", "outbox.sqlite3")
+)
+OUTBOX_REPLAY_INTERVAL = float(os.environ.get("BOOKBUDDY_OUTBOX_REPLAY_INTERVAL", "2"))  # seconds between replays
+OUTBOX_BACKOFF_MAX = 3600  # seconds between replays of one failing entry
+OUTBOX_RETRY_CLIENT_STATUSES = frozenset([408, 425, 429])  # other 4xx answers are dead-lettered, not replayed
+
+# Chunked recording ingest endpoint (the browser streams segments here while recording)
+INGEST_ENABLED = os.environ.get("BOOKBUDDY_INGEST_ENABLED", "false").lower() == "true"
+INGEST_HOST = os.environ.get("BOOKBUDDY_INGEST_HOST", "127.0.0.1")
+INGEST_PORT = int(os.environ.get("BOOKBUDDY_INGEST_PORT", "8765"))
+INGEST_PUBLIC_URL = os.environ.get("BOOKBUDDY_INGEST_URL", f"http://localhost:{INGEST_PORT}")  # as seen by browsers
+INGEST_ALLOWED_ORIGINS = [  # origins the app is served from; by default the local Streamlit server
+    origin.strip().rstrip('/') for origin in os.environ.get("BOOKBUDDY_APP_ORIGINS", "").split(",") if origin.strip()
+]
+INGEST_SPOOL_DIR = os.environ.get(
+    "BOOKBUDDY_INGEST_DIR", os.path.join(os.path.expanduser("~"), ".book_buddy", "uploads")
+)
+INGEST_SEGMENT_SECONDS = float(os.environ.get("BOOKBUDDY_INGEST_SEGMENT_SECONDS", "5"))
+INGEST_MAX_SEGMENT_BYTES = 16 * 1024 * 1024
+INGEST_MAX_SEGMENTS = 10000
+INGEST_TICKET_TTL = 24 * 3600  # seconds an idle upload ticket and its spooled segments are kept
+
+# Document export
+EXPORT_DIR = os.environ.get("BOOKBUDDY_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "book_buddy_exports"))
+RENDER_WORKERS = int(os.environ.get("BOOKBUDDY_RENDER_WORKERS", "2"))  # documents rendered at once
+RENDER_QUEUE_SIZE = int(os.environ.get("BOOKBUDDY_RENDER_QUEUE_SIZE", "20"))  # renders waiting before back-pressure
+ARTIFACT_CACHE_DIR = os.environ.get(
+    "BOOKBUDDY_ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "book_buddy_artifacts")
+)
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("BOOKBUDDY_ARTIFACT_CACHE_MB", "512")) * 1024 * 1024
+
+# Audio quality profiles, used by the browser recorder and by server-side transcoding
+AUDIO_QUALITY_PROFILES = {
+    'High': {'bitrate': 128000, 'channels': 2, 'sample_rate': 48000, 'application': 'audio'},
+    'Medium': {'bitrate': 48000, 'channels': 1, 'sample_rate': 48000, 'application': 'audio'},
+    'Low': {'bitrate': 16000, 'channels': 1, 'sample_rate': 16000, 'application': 'voip'}  # speech dictation
+}
+AUDIO_QUALITY_OPTIONS = list(AUDIO_QUALITY_PROFILES) + ['Custom']
+OPUS_SAMPLE_RATES = [8000, 12000, 16000, 24000, 48000]
+
+# Server-side transcoding of uploads before delivery (needs ffmpeg with libopus)
+FFMPEG_PATH = os.environ.get("BOOKBUDDY_FFMPEG", "ffmpeg")
+TRANSCODE_WORKERS = int(os.environ.get("BOOKBUDDY_TRANSCODE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+TRANSCODE_TIMEOUT = 600  # seconds per file
+TRANSCODE_MODES = {
+    'off': 'Off (send as uploaded)',
+    'uncompressed': 'Uncompressed uploads (WAV)',
+    'all': 'All uploads'
+}
+UNCOMPRESSED_AUDIO_TYPES = ('audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave')
+
 # Page configuration
 st.set_page_config(
     page_title="🎙️ Book Buddy - Enhanced Edition", 
@@ -118,9 +252,27 @@ def initialize_session_state():
             'description': '',
             'tags': []
         },
-        'webhook_responses': [],
+        'webhook_history': WebhookHistory(),
+        'outbox_owner': uuid.uuid4().hex,  # tags this session's outbox entries
+        'pending_jobs': [],
+        'upload_batch': None,
         'last_recording': None,
         'audio_quality': 'High',
+        'custom_bitrate_kbps': 32,
+        'custom_channels': 1,
+        'custom_sample_rate': 24000,
+        'exports': {},
+        'render_jobs': {},
+        'export_errors': {},
+        'book_layout': load_exporters().DEFAULT_LAYOUT,
+        'upload_transport': 'json',
+        'request_encoding': REQUEST_ENCODING if REQUEST_ENCODING in REQUEST_CODECS else 'identity',
+        'compression_level': REQUEST_COMPRESSION_LEVEL,
+        'fanout_urls': FANOUT_URLS,
+        'skip_duplicates': DEDUP_TTL > 0,
+        'idempotency_keys': IDEMPOTENCY_KEYS,
+        'transcode_mode': 'off',
+        'max_attempts': WEBHOOK_MAX_ATTEMPTS,
         'auto_send': True,
         'show_advanced': False
     }
@@ -150,608 +302,2922 @@ def format_file_size(size_bytes):
     s = round(size_bytes / p, 2)
     return f"{s} {size_names[i]}"
 
-def send_to_webhook(payload, webhook_url=None):
-    """Enhanced webhook sending with better error handling"""
-    url = webhook_url or st.session_state.webhook_url
+def format_reading_time(minutes):
+    """Reading time as e.g. '45 min' or '3 h 20 min'"""
+    minutes = max(1, round(minutes))
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60} h {minutes % 60} min"
+
+# HTTP connection pooling
+class ConnectionPoolStats:
+    """Thread-safe counters for pooled webhook connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.per_host = {}
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self, host):
+        with self._lock:
+            self.new_connections += 1
+            self.per_host[host] = self.per_host.get(host, 0) + 1
+
+    def snapshot(self):
+        """Return a consistent copy of the counters"""
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': reused,
+                'reuse_ratio': reused / self.requests if self.requests else 0.0,
+                'per_host': dict(self.per_host)
+            }
+
+def _keepalive_socket_options(default_options):
+    """TCP keep-alive options so idle pooled sockets survive between sends"""
+    options = list(default_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, HTTP_KEEPALIVE_IDLE))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15))
+    return options
+
+# Phase timings for the request being sent on this thread
+_request_timing = threading.local()
+
+def _record_timing(phase, seconds):
+    timing = getattr(_request_timing, 'current', None)
+    if timing is not None:
+        timing[phase] = timing.get(phase, 0.0) + seconds
+
+def _header_bytes(headers):
+    """Approximate size of a header block on the wire"""
+    return sum(len(str(name)) + len(str(value)) + 4 for name, value in headers.items()) + 2
+
+@st.cache_resource(show_spinner=False)
+def load_http_stack():
+    """Import requests/urllib3 on the first send and build the instrumented transport on top"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+
+    class TimedHTTPConnection(HTTPConnection):
+        """HTTP connection that records how long the TCP connect took"""
+
+        def _new_conn(self):
+            started = time.perf_counter()
+            try:
+                return super()._new_conn()
+            finally:
+                _record_timing('connect', time.perf_counter() - started)
+
+    class TimedHTTPSConnection(HTTPSConnection):
+        """HTTPS connection that records TCP connect and TLS handshake time separately"""
+
+        def _new_conn(self):
+            started = time.perf_counter()
+            try:
+                return super()._new_conn()
+            finally:
+                _record_timing('connect', time.perf_counter() - started)
+
+        def connect(self):
+            timing = getattr(_request_timing, 'current', None)
+            if timing is None:  # an empty dict is the live per-request one, so no `or {}`
+                timing = {}
+            connect_before = timing.get('connect', 0.0)
+            started = time.perf_counter()
+            super().connect()
+            elapsed = time.perf_counter() - started
+            _record_timing('tls', max(0.0, elapsed - (timing.get('connect', 0.0) - connect_before)))
+
+    class PooledWebhookAdapter(HTTPAdapter):
+        """HTTPAdapter that counts new connections per host, enables TCP keep-alive
+        and attaches a connect/TLS/time-to-first-byte breakdown to each response
+        as ``response.timing``
+        """
+
+        def __init__(self, stats, **kwargs):
+            self.stats = stats
+            super().__init__(**kwargs)
+
+        def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+            pool_kwargs.setdefault('socket_options', _keepalive_socket_options(HTTPConnection.default_socket_options))
+            super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+            stats = self.stats
+
+            class CountingHTTPConnectionPool(HTTPConnectionPool):
+                ConnectionCls = TimedHTTPConnection
+
+                def _new_conn(self):
+                    stats.record_new_connection(self.host)
+                    return super()._new_conn()
+
+            class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+                ConnectionCls = TimedHTTPSConnection
+
+                def _new_conn(self):
+                    stats.record_new_connection(self.host)
+                    return super()._new_conn()
+
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': CountingHTTPConnectionPool,
+                'https': CountingHTTPSConnectionPool
+            }
+
+        def send(self, request, **kwargs):
+            self.stats.record_request()
+            timing = {}
+            _request_timing.current = timing
+            started = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            finally:
+                _request_timing.current = None
+            # Time from writing the request (after any connect/handshake) until the response headers arrived
+            elapsed = time.perf_counter() - started
+            timing['ttfb'] = max(0.0, elapsed - timing.get('connect', 0.0) - timing.get('tls', 0.0))
+            body_bytes = len(request.body) if request.body is not None else 0
+            response.timing = timing
+            # Request line ("POST /path HTTP/1.1"), headers and body
+            response.request_bytes = (len(request.method) + len(request.path_url) + 12
+                                      + _header_bytes(request.headers) + body_bytes)
+            return response
+
+    return SimpleNamespace(requests=requests, PooledWebhookAdapter=PooledWebhookAdapter)
+
+class WebhookSessionPool:
+    """Process-wide pooled requests session shared by every Streamlit session.
+
+    The session itself is built on the first send, so rendering the page
+    (which only reads the counters) does not import the HTTP stack.
+    """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 pool_block=HTTP_POOL_BLOCK):
+        self.stats = ConnectionPoolStats()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        http = load_http_stack()
+        session = http.requests.Session()
+        # The session is shared between users, so never persist cookies across requests
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.headers.update({
+            'User-Agent': 'Book-Buddy-Enhanced/1.1.0',
+            'Connection': 'keep-alive'
+        })
+        adapter = http.PooledWebhookAdapter(
+            self.stats,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+@st.cache_resource(show_spinner=False)
+def get_webhook_session_pool():
+    """Pooled HTTP session cached across reruns and sessions"""
+    return WebhookSessionPool()
+
+# Streaming upload bodies
+def _stream_length(fileobj):
+    """Remaining bytes in a seekable file object without reading it"""
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    end = fileobj.tell()
+    fileobj.seek(position)
+    return end - position
+
+class StreamingBody:
+    """File-like request body that reads byte segments and file objects lazily.
+
+    Segments are either ``bytes`` or seekable file objects. The total length
+    is known up front so requests sends a Content-Length header instead of
+    chunked encoding, and at most ``chunk_size`` bytes of the file are held
+    in memory at any time.
+    """
+
+    def __init__(self, segments, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._segments = []
+        for segment in segments:
+            if isinstance(segment, (bytes, bytearray)):
+                self._segments.append((bytes(segment), None, len(segment)))
+            else:
+                self._segments.append((None, segment, _stream_length(segment)))
+        self._length = sum(size for _, _, size in self._segments)
+        self._starts = [fileobj.tell() if fileobj is not None else 0 for _, fileobj, _ in self._segments]
+        self.rewind()
+
+    def __len__(self):
+        return self._length
+
+    def rewind(self):
+        """Reset to the beginning so the body can be sent again"""
+        self._index = 0
+        self._offset = 0
+        for (_, fileobj, _), start in zip(self._segments, self._starts):
+            if fileobj is not None:
+                fileobj.seek(start)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.chunk_size
+        size = min(size, self.chunk_size)
+        while self._index < len(self._segments):
+            data, fileobj, length = self._segments[self._index]
+            remaining = length - self._offset
+            if remaining <= 0:
+                self._index += 1
+                self._offset = 0
+                continue
+            take = min(size, remaining)
+            if data is not None:
+                chunk = data[self._offset:self._offset + take]
+            else:
+                chunk = fileobj.read(take)
+                if not chunk:
+                    raise IOError("Upload stream ended before its declared length")
+            self._offset += len(chunk)
+            return chunk
+        return b''
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+class MultipartStream(StreamingBody):
+    """multipart/form-data body with metadata fields and one streamed file part"""
+
+    def __init__(self, fields, fileobj, filename, content_type, field_name='audio_file'):
+        self.boundary = f"----BookBuddy{base64.urlsafe_b64encode(os.urandom(12)).decode('ascii')}"
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+
+        head = io.BytesIO()
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            head.write(f"--{self.boundary}\r\n".encode())
+            head.write(f'Content-Disposition: form-data; name="{_quote_form_name(name)}"\r\n\r\n'.encode())
+            head.write(value.encode('utf-8'))
+            head.write(b"\r\n")
+        head.write(f"--{self.boundary}\r\n".encode())
+        head.write(
+            f'Content-Disposition: form-data; name="{_quote_form_name(field_name)}"; '
+            f'filename="{_quote_form_name(filename)}"\r\n'.encode('utf-8')
+        )
+        head.write(f"Content-Type: {content_type or 'application/octet-stream'}\r\n\r\n".encode())
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        super().__init__([head.getvalue(), fileobj, tail])
+
+def _quote_form_name(value):
+    """Escape a form-data parameter value per the HTML multipart rules"""
+    return str(value).replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+def _metadata_headers(payload):
+    """Encode payload metadata as X-Book-Buddy-* headers for raw binary uploads"""
+    import urllib.parse
+    headers = {}
+    for key, value in payload.items():
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            value = json.dumps(value)
+        name = 'X-Book-Buddy-' + '-'.join(part.capitalize() for part in key.split('_'))
+        headers[name] = urllib.parse.quote(value, safe=' /:;,.@()')
+    return headers
+
+# JSON serialization and request compression
+def _stdlib_dumps(obj):
+    return json.dumps(obj).encode('utf-8')
+
+def _orjson_dumps(obj):
+    try:
+        return orjson.dumps(obj)
+    except TypeError:
+        # orjson refuses some inputs the stdlib accepts (non-str keys, huge ints)
+        return _stdlib_dumps(obj)
+
+JSON_SERIALIZERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    JSON_SERIALIZERS['orjson'] = _orjson_dumps
+
+def serialize_json(obj):
+    """Serialize ``obj`` to UTF-8 JSON bytes with the configured serializer"""
+    return JSON_SERIALIZERS.get(JSON_SERIALIZER, _stdlib_dumps)(obj)
+
+REQUEST_CODECS = {
+    'gzip': lambda body, level: gzip.compress(body, compresslevel=max(1, min(level, 9)), mtime=0),
+    'deflate': lambda body, level: zlib.compress(body, max(1, min(level, 9)))
+}
+if zstandard is not None:
+    REQUEST_CODECS['zstd'] = lambda body, level: zstandard.ZstdCompressor(level=max(1, min(level, 22))).compress(body)
+
+class CompressionPolicy:
+    """Content-Encoding applied to serialized JSON request bodies of at least ``threshold`` bytes"""
+
+    def __init__(self, encoding=REQUEST_ENCODING, level=REQUEST_COMPRESSION_LEVEL,
+                 threshold=REQUEST_COMPRESSION_THRESHOLD):
+        self.encoding = encoding if encoding in REQUEST_CODECS else 'identity'
+        self.level = level
+        self.threshold = threshold
+
+    def apply(self, body, headers, timings):
+        """Return the body to send, adding a Content-Encoding header when it was compressed"""
+        if self.encoding == 'identity' or len(body) < self.threshold:
+            return body
+        started = time.perf_counter()
+        compressed = REQUEST_CODECS[self.encoding](body, self.level)
+        timings['compress'] = time.perf_counter() - started
+        headers['Content-Encoding'] = self.encoding
+        return compressed
+
+PLAIN_BODIES = CompressionPolicy('identity')
+
+class EncodingRejections:
+    """Webhook URLs that recently refused compressed bodies, which are then sent plain"""
+
+    def __init__(self, ttl=ENCODING_REJECTION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._until = {}
+
+    def add(self, url):
+        with self._lock:
+            self._until[url] = time.time() + self.ttl
+
+    def __contains__(self, url):
+        with self._lock:
+            until = self._until.get(url)
+            if until is not None and until < time.time():
+                del self._until[url]
+                until = None
+            return until is not None
+
+def rejects_encoding(response, encoding):
+    """Whether an error answer to a compressed body means the endpoint cannot decode ``encoding``
+
+    415 always does. A 400 only counts when it names the encoding, in its
+    body or in an Accept-Encoding header that leaves it out, since ordinary
+    payload validation errors are 400s too.
+    """
+    if response.status_code == 415:
+        return True
+    if response.status_code != 400:
+        return False
+    accepted = response.headers.get('Accept-Encoding')
+    if accepted is not None and encoding not in accepted.lower():
+        return True
+    text = (response.text or '')[:2000].lower()
+    return encoding in text or 'content-encoding' in text
+
+@st.cache_resource(show_spinner=False)
+def get_encoding_rejections():
+    """URLs known to reject compressed bodies, shared by every session"""
+    return EncodingRejections()
+
+# Duplicate suppression
+def audio_digest(audio_file):
+    """SHA-256 of the audio bytes, read in chunks without moving the file position"""
+    digest = hashlib.sha256()
+    position = audio_file.tell()
+    audio_file.seek(0)
+    for chunk in iter(functools.partial(audio_file.read, UPLOAD_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    audio_file.seek(position)
+    return digest.hexdigest()
+
+def payload_digest(payload):
+    """SHA-256 of a payload's metadata in canonical form
+
+    The per-send timestamp, inline audio and transcoding report (which
+    includes how long the encode took) are left out.
+    """
+    metadata = {key: value for key, value in payload.items()
+                if key not in ('timestamp', 'audio_data', 'transcoded', 'transcode_error')}
+    return hashlib.sha256(json.dumps(metadata, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def delivery_key(url, digest, payload):
+    """Key of one audio file with its metadata sent to one URL, also used as its Idempotency-Key
+
+    The metadata is part of the key, so a corrected title or another user
+    sending the same file is a new delivery rather than a duplicate.
+    """
+    return hashlib.sha256(f"{url}\0{digest}\0{payload_digest(payload)}".encode('utf-8')).hexdigest()
+
+class DedupPolicy:
+    """Whether repeated audio is skipped and whether sends carry an Idempotency-Key header"""
+
+    def __init__(self, skip_duplicates=DEDUP_TTL > 0, idempotency_key=IDEMPOTENCY_KEYS):
+        self.skip_duplicates = skip_duplicates
+        self.idempotency_key = idempotency_key
+
+class DeliveryDeduplicator:
+    """Recently delivered audio by content key, shared by every session.
+
+    A send whose key was delivered within ``ttl`` seconds is skipped. A send
+    whose key is being delivered right now waits for that delivery and is
+    skipped if it succeeds, so a double-clicked "Send" ships the audio once.
+    """
+
+    def __init__(self, ttl=DEDUP_TTL, max_entries=DEDUP_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._delivered = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.bytes_saved = 0
+
+    def _lookup(self, key):
+        entry = self._delivered.get(key)
+        if entry is not None and entry['delivered_at'] < time.time() - self.ttl:
+            del self._delivered[key]
+            entry = None
+        return entry
+
+    def acquire(self, key, wait=DEDUP_WAIT):
+        """Return (earlier delivery or None, owned); ``owned`` sends must be passed to release()"""
+        deadline = time.monotonic() + wait
+        while True:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.duplicates += 1
+                    self.bytes_saved += entry['payload_size']
+                    return dict(entry), False
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    return None, True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not event.wait(remaining):
+                # The other send is taking too long; do not hold this one back any further
+                return None, False
+
+    def release(self, key, success, payload_size=0):
+        """Finish an owned send, remembering it when it was delivered"""
+        with self._lock:
+            event = self._inflight.pop(key, None)
+            if success:
+                self._delivered[key] = {'delivered_at': time.time(), 'payload_size': payload_size or 0}
+                self._delivered.move_to_end(key)
+                while len(self._delivered) > self.max_entries:
+                    self._delivered.popitem(last=False)
+        if event is not None:
+            event.set()
+
+    def stats(self):
+        with self._lock:
+            return {'remembered': len(self._delivered), 'duplicates': self.duplicates,
+                    'bytes_saved': self.bytes_saved}
+
+@st.cache_resource(show_spinner=False)
+def get_delivery_deduplicator():
+    """Delivered-audio memory shared by every session"""
+    return DeliveryDeduplicator()
+
+def build_request_body(payload, audio_file=None, transport='json', timings=None, compression=None):
+    """Return (request kwargs, extra headers, wire size, uncompressed size) for the chosen transport
+
+    JSON bodies are serialized to bytes exactly once here, optionally
+    compressed per ``compression``, and reused for every retry. Streamed
+    audio bodies are sent as-is. ``timings`` (a dict) receives the seconds
+    spent on the audio ``encode``, ``serialize`` and ``compress`` steps.
+    """
+    timings = {} if timings is None else timings
+    if audio_file is None or transport == 'json':
+        encoded = None
+        if audio_file is not None:
+            started = time.perf_counter()
+            audio_file.seek(0)
+            encoded = base64.b64encode(audio_file.read())
+            timings['encode'] = time.perf_counter() - started
+            payload = {key: value for key, value in payload.items() if key != 'audio_data'}
+        started = time.perf_counter()
+        body = serialize_json(payload)
+        if encoded is not None:
+            # Base64 needs no JSON escaping, so splice it in rather than re-scanning it in json.dumps
+            separator = b', ' if len(body) > 2 else b''
+            body = b''.join([body[:-1], separator, b'"audio_data": "', encoded, b'"}'])
+        timings['serialize'] = time.perf_counter() - started
+        headers = {'Content-Type': 'application/json'}
+        wire_body = (compression or CompressionPolicy()).apply(body, headers, timings)
+        return {'data': wire_body}, headers, len(wire_body), len(body)
+
+    filename = payload.get('filename') or getattr(audio_file, 'name', 'audio')
+    content_type = payload.get('audio_format') or getattr(audio_file, 'type', None) or 'application/octet-stream'
+    audio_file.seek(0)
+
+    started = time.perf_counter()
+    if transport == 'multipart':
+        body = MultipartStream(payload, audio_file, filename, content_type)
+        timings['serialize'] = time.perf_counter() - started
+        return {'data': body}, {'Content-Type': body.content_type}, len(body), len(body)
+    if transport == 'binary':
+        body = StreamingBody([audio_file])
+        headers = _metadata_headers(payload)
+        headers['Content-Type'] = content_type
+        timings['serialize'] = time.perf_counter() - started
+        return {'data': body}, headers, len(body), len(body)
+    raise ValueError(f"Unknown upload transport: {transport}")
+
+# Retries and circuit breaking
+class RetryPolicy:
+    """Exponential backoff with full jitter for retryable webhook failures"""
+
+    def __init__(self, max_attempts=WEBHOOK_MAX_ATTEMPTS, backoff_base=WEBHOOK_BACKOFF_BASE,
+                 backoff_max=WEBHOOK_BACKOFF_MAX, retry_statuses=WEBHOOK_RETRY_STATUSES):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait after the given (1-based) failed attempt"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """Per-URL breaker that fails fast while an endpoint keeps failing"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_thread = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a probe request through"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.time() - self._opened_at))
+
+    def allow(self):
+        """Whether a request may be attempted now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN and not self._probing:
+                # Let exactly one probe through until it reports back
+                self._probing = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    @property
+    def idle(self):
+        """Closed with no failures counted, so forgetting it loses nothing"""
+        with self._lock:
+            return self._state == self.CLOSED and self._failures == 0
+
+    def release_probe(self):
+        """Give up this thread's half-open probe without reporting an outcome"""
+        with self._lock:
+            if self._probing and self._probe_thread == threading.get_ident():
+                self._probing = False
+                self._probe_thread = None
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+            self._probe_thread = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.time()
+            self._probing = False
+            self._probe_thread = None
+
+class CircuitBreakerRegistry:
+    """Thread-safe map of webhook URL to its circuit breaker, bounded to ``max_breakers`` URLs
+
+    Every URL a user types gets a breaker, so past the limit the least
+    recently used idle breaker is dropped; only when every breaker is
+    tracking failures does the least recently used one go regardless.
+    """
+
+    def __init__(self, max_breakers=CIRCUIT_MAX_BREAKERS):
+        self.max_breakers = max_breakers
+        self._lock = threading.Lock()
+        self._breakers = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._breakers)
+
+    def get(self, url):
+        with self._lock:
+            if url in self._breakers:
+                self._breakers.move_to_end(url)
+                return self._breakers[url]
+            breaker = self._breakers[url] = CircuitBreaker()
+            while len(self._breakers) > self.max_breakers:
+                victim = next((other for other, b in self._breakers.items() if b.idle and other != url), None)
+                if victim is None:
+                    victim = next(iter(self._breakers))
+                del self._breakers[victim]
+            return breaker
+
+@st.cache_resource(show_spinner=False)
+def get_circuit_breakers():
+    """Circuit breakers shared by every session in this process"""
+    return CircuitBreakerRegistry()
+
+def deliver_webhook(url, payload, audio_file=None, transport='json', retry_policy=None, compression=None,
+                    dedup=None, body=None, digest=None, hash_seconds=None, key_payload=None):
+    """Send a payload to a webhook URL and describe the outcome
+
+    When ``audio_file`` is given it is attached according to ``transport``:
+    base64 inside the JSON payload, a streamed multipart/form-data part, or
+    the raw request body with the payload carried in headers. This does not
+    touch session state, so it is safe to call from background workers.
+    JSON bodies are compressed according to ``compression`` (a
+    CompressionPolicy, by default the deployment-wide setting). If the
+    endpoint answers a compressed body with 415 (or a 400 that names the
+    encoding, see rejects_encoding) the body is resent plain straight
+    away, and that URL gets plain bodies for a while. Every outcome is
+    also counted in the process-wide delivery metrics.
+
+    Audio is keyed by SHA-256 of its bytes, its metadata and the URL. Per
+    ``dedup`` (a DedupPolicy), the same audio and metadata already
+    delivered to that URL within DEDUP_TTL is not sent again, and the key
+    is sent as an Idempotency-Key header. ``digest`` and ``key_payload``
+    let the caller key the send by the audio and metadata as submitted,
+    before a pipeline stage such as transcoding rewrote them; ``body`` (from
+    SharedRequestBody.endpoint) and ``hash_seconds`` let a fan-out build the body
+    and hash the audio once for every endpoint.
+    """
+    dedup = dedup or DedupPolicy()
+    key = None
+    if audio_file is not None and (dedup.skip_duplicates or dedup.idempotency_key):
+        if digest is None:
+            started = time.perf_counter()
+            digest = audio_digest(audio_file)
+            hash_seconds = time.perf_counter() - started
+        key = delivery_key(url, digest, payload if key_payload is None else key_payload)
     
+    owned = False
+    if key is not None and dedup.skip_duplicates:
+        earlier, owned = get_delivery_deduplicator().acquire(key)
+        if earlier is not None:
+            result = duplicate_result(earlier, transport, hash_seconds)
+            result[2]['endpoint'] = url
+            get_webhook_metrics().observe(result[0], result[2])
+            return result
+    
+    result = (False, "Error: delivery did not finish", {})
+    try:
+        result = _deliver_webhook(url, payload, audio_file, transport, retry_policy, compression,
+                                  key if dedup.idempotency_key else None, body)
+    finally:
+        if owned:
+            get_delivery_deduplicator().release(key, result[0], result[2].get('payload_size'))
+    if hash_seconds is not None:
+        result[2].setdefault('timings', {})['hash'] = hash_seconds
+    result[2]['endpoint'] = url
+    get_webhook_metrics().observe(result[0], result[2])
+    return result
+
+def duplicate_result(earlier, transport, hash_seconds):
+    """Outcome of a send skipped because the same audio was already delivered"""
+    delivered_at = datetime.fromtimestamp(earlier['delivered_at'])
+    response_data = {
+        'timestamp': datetime.now().isoformat(),
+        'success': True,
+        'deduplicated': True,
+        'bytes_saved': earlier['payload_size'],
+        'payload_size': 0,
+        'transport': transport,
+        'attempts': 0,
+        'elapsed': hash_seconds,
+        'timings': {'hash': hash_seconds} if hash_seconds is not None else {},
+        'response_text': f"Duplicate of the delivery at {delivered_at.isoformat(timespec='seconds')}"
+    }
+    message = (f"Already delivered at {delivered_at.strftime('%H:%M:%S')}, not sent again "
+               f"({format_file_size(earlier['payload_size'])} saved)")
+    return True, message, response_data
+
+def _deliver_webhook(url, payload, audio_file, transport, retry_policy, compression, idempotency_key=None, body=None):
+    breaker = get_circuit_breakers().get(url)
+    if not breaker.allow():
+        error_data = {'error': 'Circuit open', 'timestamp': datetime.now().isoformat(), 'attempts': 0}
+        return False, f"Webhook unhealthy, skipping send (retry in {breaker.retry_in():.0f}s)", error_data
+    try:
+        return _send_webhook(url, payload, audio_file, transport, retry_policy, compression, idempotency_key, body,
+                             breaker)
+    finally:
+        # Exits without a transport outcome (body errors, unexpected exceptions) must not keep the probe slot
+        breaker.release_probe()
+
+def _send_webhook(url, payload, audio_file, transport, retry_policy, compression, idempotency_key, body, breaker):
+    started = time.perf_counter()
+    policy = retry_policy or RetryPolicy()
     try:
         headers = {
-            'Content-Type': 'application/json',
             'User-Agent': 'Book-Buddy-Enhanced/1.1.0'
         }
+        if idempotency_key:
+            # Stays the same across retries, so the receiver can drop repeats too
+            headers['Idempotency-Key'] = idempotency_key
         
         # Add timestamp if not present
         if 'timestamp' not in payload:
             payload['timestamp'] = datetime.now().isoformat()
         
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-        
-        # Store response in session state
-        response_data = {
-            'timestamp': datetime.now().isoformat(),
-            'status_code': response.status_code,
-            'success': response.status_code == 200,
-            'payload_size': len(json.dumps(payload)),
-            'response_text': response.text[:500] if response.text else None
-        }
-        
-        st.session_state.webhook_responses.insert(0, response_data)
-        # Keep only last 10 responses
-        st.session_state.webhook_responses = st.session_state.webhook_responses[:10]
-        
-        if response.status_code == 200:
-            return True, "Successfully sent to webhook!", response_data
+        if url in get_encoding_rejections():
+            compression = PLAIN_BODIES
+        if body is not None:
+            build_body = body.build
         else:
-            return False, f"Webhook returned status {response.status_code}", response_data
-            
-    except requests.exceptions.Timeout:
-        error_data = {'error': 'Request timeout', 'timestamp': datetime.now().isoformat()}
-        st.session_state.webhook_responses.insert(0, error_data)
-        return False, "Request timed out (30s)", error_data
-    except requests.exceptions.ConnectionError:
-        error_data = {'error': 'Connection error', 'timestamp': datetime.now().isoformat()}
-        st.session_state.webhook_responses.insert(0, error_data)
-        return False, "Could not connect to webhook", error_data
+            build_body = functools.partial(build_request_body, payload, audio_file, transport)
+        body_timings = {}
+        request_kwargs, body_headers, payload_size, raw_size = build_body(body_timings, compression)
+        headers.update(body_headers)
     except Exception as e:
-        error_data = {'error': str(e), 'timestamp': datetime.now().isoformat()}
-        st.session_state.webhook_responses.insert(0, error_data)
+        error_data = {'error': str(e), 'timestamp': datetime.now().isoformat(), 'attempts': 0}
         return False, f"Error: {str(e)}", error_data
-
-def create_enhanced_voice_recorder():
-    """Create enhanced voice recorder with better UI and functionality"""
-    webhook_url = st.session_state.webhook_url
-    title = st.session_state.recording_title
-    description = st.session_state.recording_description
-    user_name = st.session_state.user_name
-    book_type = st.session_state.book_type
-    auto_send = st.session_state.auto_send
-    
-    recorder_html = f"""
-    <div id="voice-recorder-enhanced" style="
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 30px;
-        border-radius: 20px;
-        margin: 20px 0;
-        box-shadow: 0 12px 40px rgba(0,0,0,0.15);
-        color: white;
-        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-    ">
-        <div style="text-align: center; margin-bottom: 25px;">
-            <h2 style="margin: 0 0 10px 0; font-size: 28px; font-weight: 700;">🎙️ Enhanced Voice Recorder</h2>
-            <p style="margin: 0; opacity: 0.9; font-size: 16px;">Professional audio recording with auto-webhook integration</p>
-        </div>
-        
-        <!-- Webhook Status -->
-        <div style="
-            background: rgba(255,255,255,0.15);
-            padding: 15px;
-            border-radius: 12px;
-            margin-bottom: 25px;
-            backdrop-filter: blur(10px);
-        ">
-            <div style="display: flex; align-items: center; justify-content: space-between; flex-wrap: wrap;">
-                <div>
-                    <strong>🎯 Webhook:</strong> 
-                    <span style="font-family: monospace; font-size: 12px; opacity: 0.8;">{{webhook_url[:50]}}...</span>
-                </div>
-                <div style="margin-top: 5px;">
-                    <span style="background: rgba(76, 175, 80, 0.8); padding: 4px 12px; border-radius: 15px; font-size: 12px;">
-                        ✅ Auto-send: {{'ON' if auto_send else 'OFF'}}
-                    </span>
-                </div>
-            </div>
-        </div>
+    
+    attempt = 0
+    while True:
+        attempt += 1
+        retry_after = None
+        data = request_kwargs.get('data')
+        if isinstance(data, StreamingBody):
+            data.rewind()
         
-        <!-- Recording Controls -->
-        <div style="text-align: center; margin-bottom: 25px;">
-            <button id="recordBtn" style="
-                background: linear-gradient(45deg, #ff6b6b, #ff8e8e);
-                color: white;
-                border: none;
-                padding: 20px 40px;
-                font-size: 18px;
-                border-radius: 50px;
-                cursor: pointer;
-                margin: 0 10px;
-                transition: all 0.3s ease;
-                box-shadow: 0 8px 25px rgba(255, 107, 107, 0.4);
-                font-weight: bold;
-                min-width: 180px;
-            ">🎙️ Start Recording</button>
+        try:
+            response = get_webhook_session_pool().post(url, headers=headers, timeout=30, **request_kwargs)
+        except load_http_stack().requests.exceptions.Timeout:
+            breaker.record_failure()
+            result = (False, "Request timed out (30s)", {'error': 'Request timeout'})
+        except load_http_stack().requests.exceptions.ConnectionError:
+            breaker.record_failure()
+            result = (False, "Could not connect to webhook", {'error': 'Connection error'})
+        except Exception as e:
+            # Not a transport problem, so retrying will not help
+            error_data = {'error': str(e), 'timestamp': datetime.now().isoformat(), 'attempts': attempt,
+                          'elapsed': time.perf_counter() - started}
+            return False, f"Error: {str(e)}", error_data
+        else:
+            response_data = {
+                'timestamp': datetime.now().isoformat(),
+                'status_code': response.status_code,
+                'success': 200 <= response.status_code < 300,
+                'payload_size': payload_size,
+                'uncompressed_size': raw_size,
+                'content_encoding': body_headers.get('Content-Encoding', 'identity'),
+                'transport': transport if audio_file is not None else 'json',
+                'attempts': attempt,
+                'elapsed': time.perf_counter() - started,
+                'timings': dict(body_timings, **getattr(response, 'timing', {}), total=time.perf_counter() - started),
+                'request_bytes': getattr(response, 'request_bytes', payload_size),
+                'response_bytes': _header_bytes(response.headers) + len(response.content),
+                'response_text': response.text[:500] if response.text else None
+            }
             
-            <button id="stopBtn" disabled style="
-                background: linear-gradient(45deg, #666, #888);
-                color: white;
-                border: none;
-                padding: 20px 40px;
-                font-size: 18px;
-                border-radius: 50px;
-                cursor: not-allowed;
-                margin: 0 10px;
-                transition: all 0.3s ease;
-                font-weight: bold;
-                min-width: 180px;
-            ">⏹️ Stop Recording</button>
-        </div>
-        
-        <!-- Status Display -->
-        <div id="statusDisplay" style="
-            text-align: center;
-            font-size: 18px;
-            font-weight: 600;
-            margin: 20px 0;
-            min-height: 30px;
-        ">📚 Ready to record your thoughts</div>
+            if 'Content-Encoding' in headers and rejects_encoding(response, headers['Content-Encoding']):
+                # The endpoint cannot decode the body; resend it plain without counting a failure
+                get_encoding_rejections().add(url)
+                del headers['Content-Encoding']
+                body_timings = {}
+                request_kwargs, body_headers, payload_size, raw_size = build_body(body_timings, PLAIN_BODIES)
+                headers.update(body_headers)
+                continue
+            
+            if response.status_code not in policy.retry_statuses:
+                # The endpoint answered deliberately, even if with a client error
+                breaker.record_success()
+                if 200 <= response.status_code < 300:
+                    return True, "Successfully sent to webhook!", response_data
+                return False, f"Webhook returned status {response.status_code}", response_data
+            
+            breaker.record_failure()
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            result = (False, f"Webhook returned status {response.status_code}", response_data)
         
-        <!-- Waveform Visualization -->
-        <div id="waveformContainer" style="
-            background: rgba(255,255,255,0.1);
-            border-radius: 15px;
-            padding: 20px;
-            margin: 25px 0;
-            display: none;
-            position: relative;
-            height: 100px;
-            overflow: hidden;
-        ">
-            <div id="waveform" style="
-                display: flex;
-                align-items: end;
-                justify-content: center;
-                height: 100%;
-                gap: 2px;
-            "></div>
-        </div>
+        if attempt >= policy.max_attempts or not breaker.allow():
+            break
+        time.sleep(policy.delay(attempt, retry_after))
+    
+    success, message, response_data = result
+    response_data.setdefault('timestamp', datetime.now().isoformat())
+    response_data.setdefault('payload_size', payload_size)
+    response_data['attempts'] = attempt
+    response_data['elapsed'] = time.perf_counter() - started
+    response_data.setdefault('timings', dict(body_timings))['total'] = response_data['elapsed']
+    if attempt > 1:
+        message = f"{message} after {attempt} attempts"
+    return success, message, response_data
+
+# Multi-endpoint fan-out
+class SharedBufferReader:
+    """Read-only file object with its own position over a shared buffer, without copying it"""
+
+    def __init__(self, buffer, name=None, content_type=None):
+        self._view = buffer
+        self._position = 0
+        self.name = name
+        self.type = content_type
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        chunk = bytes(self._view[self._position:end])
+        self._position = max(self._position, end)
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+class SharedRequestBody:
+    """A request body built once and sent to several endpoints at the same time.
+
+    JSON bodies are serialized (and compressed) once per encoding and the
+    same bytes go to every endpoint. Streamed transports have nothing to
+    serialize; each endpoint gets its own reader over the original audio
+    (a view of its in-memory buffer, or the file reopened from disk) so
+    concurrent sends neither share a file position nor copy the recording.
+    """
+
+    def __init__(self, payload, audio_file=None, transport='json'):
+        self.payload = payload
+        self.transport = transport
+        self.audio_file = audio_file
+        self._buffer = None
+        if audio_file is not None:
+            if hasattr(audio_file, 'getbuffer'):
+                self._buffer = audio_file.getbuffer()
+            elif not os.path.isfile(getattr(audio_file, 'name', None) or ''):
+                # Neither in memory nor on disk, so there is no way to read it twice in parallel
+                audio_file.seek(0)
+                self._buffer = audio_file.read()
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def _audio_file(self, opened):
+        """A private reader over the audio; files reopened from disk are appended to ``opened`` for closing"""
+        if self.audio_file is None:
+            return None
+        if self._buffer is None:
+            reader = open(self.audio_file.name, 'rb')
+            opened.append(reader)
+            return reader
+        return SharedBufferReader(self._buffer, getattr(self.audio_file, 'name', None),
+                                  getattr(self.audio_file, 'type', None))
+
+    @contextlib.contextmanager
+    def endpoint(self):
+        """This body as seen by one endpoint; the audio files its sends reopened are closed on exit"""
+        opened = []
+        try:
+            yield SimpleNamespace(build=functools.partial(self.build, opened=opened))
+        finally:
+            for reader in opened:
+                reader.close()
+
+    def close(self):
+        """Release the view of the audio buffer so the original file can be closed again"""
+        if isinstance(self._buffer, memoryview):
+            self._buffer.release()
+        self._buffer = None
+
+    def build(self, timings, compression, opened=None):
+        """Same return value as build_request_body
+
+        A streamed body keeps reading its audio while it is sent, so the
+        file is left open and recorded in ``opened`` (see endpoint()).
+        """
+        if self.audio_file is not None and self.transport != 'json':
+            return build_request_body(self.payload, self._audio_file(opened if opened is not None else []),
+                                      self.transport, timings, compression)
+        compression = compression or CompressionPolicy()
+        key = (compression.encoding, compression.level, compression.threshold)
+        with self._lock:
+            # The first endpoint pays for serializing; the rest reuse its bytes
+            if key not in self._bodies:
+                readers = []
+                try:
+                    self._bodies[key] = build_request_body(self.payload, self._audio_file(readers), 'json', timings,
+                                                           compression)
+                finally:
+                    for reader in readers:
+                        reader.close()
+            request_kwargs, headers, wire_size, raw_size = self._bodies[key]
+        return dict(request_kwargs), dict(headers), wire_size, raw_size
+
+async def _fan_out(urls, deliver):
+    # requests is blocking, so each endpoint runs on a worker thread over the shared connection pool
+    results = await asyncio.gather(*(asyncio.to_thread(deliver, url) for url in urls), return_exceptions=True)
+    # One endpoint raising must not cost the others their results
+    return [
+        (False, f"Error: {str(result)}", {'error': str(result), 'endpoint': url,
+                                          'timestamp': datetime.now().isoformat()})
+        if isinstance(result, Exception) else result
+        for url, result in zip(urls, results)
+    ]
+
+def fan_out_webhook(urls, payload, audio_file=None, transport='json', retry_policy=None, compression=None,
+                    dedup=None, digest=None, hash_seconds=None, key_payload=None):
+    """Deliver one payload to every URL concurrently and return their results in order
+
+    The body is built and the audio hashed once for all endpoints, and each
+    endpoint keeps its own retries, circuit breaker, compression fallback
+    and duplicate check, so the total latency is that of the slowest
+    endpoint rather than the sum. ``digest``, ``hash_seconds`` and
+    ``key_payload`` are passed on to deliver_webhook.
+    """
+    if len(urls) == 1:
+        return [deliver_webhook(urls[0], payload, audio_file, transport, retry_policy, compression, dedup,
+                                digest=digest, hash_seconds=hash_seconds, key_payload=key_payload)]
+    dedup = dedup or DedupPolicy()
+    payload.setdefault('timestamp', datetime.now().isoformat())
+    if digest is None and audio_file is not None and (dedup.skip_duplicates or dedup.idempotency_key):
+        started = time.perf_counter()
+        digest = audio_digest(audio_file)
+        hash_seconds = time.perf_counter() - started
+    body = SharedRequestBody(payload, audio_file, transport)
+
+    def deliver(url):
+        with body.endpoint() as endpoint_body:
+            return deliver_webhook(url, payload, audio_file, transport, retry_policy, compression, dedup,
+                                   body=endpoint_body, digest=digest, hash_seconds=hash_seconds,
+                                   key_payload=key_payload)
+
+    try:
+        return asyncio.run(_fan_out(urls, deliver))
+    finally:
+        body.close()
+
+def summarize_fan_out(results):
+    """One message for the results of a fan-out, the first being the primary endpoint"""
+    success, message, _ = results[0]
+    if len(results) == 1:
+        return message
+    delivered = sum(1 for result in results if result[0])
+    failed = [result[2].get('endpoint', '?') for result in results[1:] if not result[0]]
+    summary = f"{message} ({delivered}/{len(results)} endpoints)"
+    if failed:
+        summary += f"; failed: {', '.join(failed)}"
+    return summary
+
+# Delivery metrics
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+
+class WebhookMetrics:
+    """Process-wide webhook delivery counters and per-phase latency histograms
+
+    Rendered in the Prometheus text exposition format for the /metrics route
+    on the ingest port and, when BOOKBUDDY_METRICS_FILE is set, rewritten to
+    that file after each delivery for a textfile collector.
+    """
+
+    def __init__(self, path=METRICS_FILE):
+        self.path = path
+        self.deliveries = {'success': 0, 'failure': 0, 'duplicate': 0}
+        self.attempts = 0
+        self.bytes_saved = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.phases = {phase: LatencyHistogram() for phase in TIMING_PHASES}
+        self._lock = threading.RLock()  # re-entered by write() -> render()
+
+    def observe(self, success, response_data):
+        with self._lock:
+            if response_data.get('deduplicated'):
+                self.deliveries['duplicate'] += 1
+                self.bytes_saved += response_data.get('bytes_saved') or 0
+            else:
+                self.deliveries['success' if success else 'failure'] += 1
+            self.attempts += response_data.get('attempts') or 0
+            self.request_bytes += response_data.get('request_bytes') or 0
+            self.response_bytes += response_data.get('response_bytes') or 0
+            for phase, seconds in (response_data.get('timings') or {}).items():
+                if phase in self.phases:
+                    self.phases[phase].observe(seconds)
+        if self.path:
+            self.write(self.path)
+
+    def render(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP bookbuddy_{name} {help_text}")
+            lines.append(f"# TYPE bookbuddy_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"bookbuddy_{name}{labels} {value}")
+
+        with self._lock:
+            metric('webhook_deliveries_total', 'counter', "Webhook deliveries by outcome",
+                   [(f'{{outcome="{outcome}"}}', count) for outcome, count in self.deliveries.items()])
+            metric('webhook_attempts_total', 'counter', "HTTP attempts made, including retries",
+                   [('', self.attempts)])
+            metric('webhook_request_bytes_total', 'counter', "Request bytes written (request line, headers and body)",
+                   [('', self.request_bytes)])
+            metric('webhook_response_bytes_total', 'counter', "Response bytes read (headers and body)",
+                   [('', self.response_bytes)])
+            metric('webhook_bytes_saved_total', 'counter', "Body bytes not sent because the audio was a duplicate",
+                   [('', self.bytes_saved)])
+            samples = []
+            for phase, histogram in self.phases.items():
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    samples.append((f'_bucket{{phase="{phase}",le="{bound}"}}', count))
+                samples.append((f'_bucket{{phase="{phase}",le="+Inf"}}', histogram.count))
+                samples.append((f'_sum{{phase="{phase}"}}', round(histogram.total, 6)))
+                samples.append((f'_count{{phase="{phase}"}}', histogram.count))
+            metric('webhook_phase_seconds', 'histogram',
+                   "Seconds per delivery phase (hash, encode, serialize, compress, connect, tls, ttfb, total)", samples)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomically replace ``path`` with the current metrics
+
+        Failures are logged, never raised: metrics I/O must not turn a
+        delivered payload into a failed (and replayed) one.
+        """
+        tmp_path = None
+        try:
+            with self._lock:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.metrics-')
+                with os.fdopen(fd, 'w') as f:
+                    f.write(self.render())
+                os.chmod(tmp_path, 0o644)  # mkstemp's 0600 would hide it from the collector
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+@st.cache_resource(show_spinner=False)
+def get_webhook_metrics():
+    """Delivery metrics shared by every session"""
+    return WebhookMetrics()
+
+# Response history
+class DeliveryRecord:
+    """Compact summary of one webhook delivery"""
+
+    __slots__ = ('timestamp', 'success', 'status_code', 'error', 'payload_size', 'uncompressed_size',
+                 'content_encoding', 'elapsed', 'timings', 'attempts', 'transport', 'source', 'response_text',
+                 'bytes_saved')
+
+    def __init__(self, response_data):
+        self.timestamp = response_data.get('timestamp') or datetime.now().isoformat()
+        self.success = bool(response_data.get('success'))
+        self.status_code = response_data.get('status_code')
+        self.error = response_data.get('error')
+        self.payload_size = response_data.get('payload_size')
+        self.uncompressed_size = response_data.get('uncompressed_size')
+        self.content_encoding = response_data.get('content_encoding')
+        self.elapsed = response_data.get('elapsed')
+        self.timings = response_data.get('timings')
+        self.attempts = response_data.get('attempts')
+        self.transport = response_data.get('transport')
+        self.source = response_data.get('source')
+        self.response_text = (response_data.get('response_text') or '')[:WEBHOOK_HISTORY_TEXT] or None
+        self.bytes_saved = response_data.get('bytes_saved')
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class WebhookHistory:
+    """Fixed-size ring buffer of delivery records with aggregate metrics
+
+    The oldest records fall off once ``maxlen`` is reached, so a
+    long-lived session or a history shared by every session stays bounded.
+    """
+
+    def __init__(self, maxlen=WEBHOOK_HISTORY_SIZE):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, response_data):
+        record = DeliveryRecord(response_data)
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    def recent(self, limit=None):
+        """Newest records first"""
+        with self._lock:
+            records = list(self._records)
+        records.reverse()
+        return records[:limit] if limit else records
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+    def summary(self):
+        records = self.recent()
+        latencies = sorted(record.elapsed for record in records
+                           if record.elapsed is not None and record.bytes_saved is None)
+        successes = sum(1 for record in records if record.success)
+        return {
+            'count': len(records),
+            'success_rate': successes / len(records) if records else None,
+            'bytes_sent': sum(record.payload_size or 0 for record in records if record.status_code is not None),
+            'duplicates': sum(1 for record in records if record.bytes_saved is not None),
+            'bytes_saved': sum(record.bytes_saved or 0 for record in records),
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99)
+        }
+
+@st.cache_resource(show_spinner=False)
+def get_shared_webhook_history():
+    """Response history shared by every session (BOOKBUDDY_HISTORY_SHARED)"""
+    return WebhookHistory()
+
+def get_webhook_history():
+    """The response history this session records into and displays"""
+    if WEBHOOK_HISTORY_SHARED:
+        return get_shared_webhook_history()
+    return st.session_state.webhook_history
+
+def record_webhook_response(response_data):
+    """Store a webhook outcome in the response history"""
+    get_webhook_history().add(response_data)
+
+def send_to_webhook(payload, webhook_url=None, audio_file=None, transport='json', retry_policy=None,
+                    compression=None, dedup=None):
+    """Enhanced webhook sending with better error handling
+
+    Without an explicit ``webhook_url`` the payload also goes to this
+    session's additional endpoints; every endpoint's outcome is recorded
+    and the primary endpoint's is returned.
+    """
+    urls = [webhook_url] if webhook_url else [st.session_state.webhook_url] + get_fanout_urls()
+    results = fan_out_webhook(urls, payload, audio_file, transport, retry_policy, compression, dedup)
+    for result in results:
+        record_webhook_response(result[2])
+    success, _, response_data = results[0]
+    return success, summarize_fan_out(results), response_data
+
+# Durable outbox
+class WebhookOutbox:
+    """SQLite-backed store of payloads that have not been delivered yet.
+
+    Entries are written before the first send attempt and deleted only once
+    the webhook answers 2xx, so nothing is lost when the endpoint is down or
+    the server restarts. Entries being sent are marked ``inflight`` so the
+    replay worker does not pick them up twice, and entries the webhook
+    rejected with a permanent 4xx are marked ``dead`` and not replayed.
+    Each entry records the session that created it (``owner``) so sessions
+    only see and discard their own.
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    transport TEXT NOT NULL,
+                    audio BLOB,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    owner TEXT
+                )
+            """)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(outbox)")}
+            if 'owner' not in columns:
+                db.execute("ALTER TABLE outbox ADD COLUMN owner TEXT")
+            # Anything in flight when the process died needs replaying
+            db.execute("UPDATE outbox SET state = 'pending' WHERE state = 'inflight'")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, url, payload, audio_bytes=None, transport='json', inflight=False, owner=None):
+        """Persist a payload and return its outbox id"""
+        entry_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO outbox (id, created_at, url, payload, transport, audio, state, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry_id, time.time(), url, json.dumps(payload), transport,
+                 audio_bytes, 'inflight' if inflight else 'pending', owner)
+            )
+        return entry_id
+
+    def owner_of(self, entry_id):
+        """The session that created an entry, or None"""
+        with self._connect() as db:
+            row = db.execute("SELECT owner FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else None
+
+    def release(self, entry_id):
+        """Hand an in-flight entry back to the replay worker"""
+        with self._connect() as db:
+            db.execute("UPDATE outbox SET state = 'pending' WHERE id = ?", (entry_id,))
+
+    def settle(self, entry_id, result):
+        """Delete a delivered entry, dead-letter a rejected one or schedule it for replay"""
+        success, message, response_data = result
+        status = (response_data or {}).get('status_code')
+        with self._connect() as db:
+            if success or (status is not None and 200 <= status < 300):
+                db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+                return
+            if status is not None and 400 <= status < 500 and status not in OUTBOX_RETRY_CLIENT_STATUSES:
+                # The webhook refused this payload; sending it again will not change its mind
+                db.execute(
+                    "UPDATE outbox SET state = 'dead', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                    (message, entry_id)
+                )
+                return
+            row = db.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return
+            attempts = row[0] + 1
+            delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_REPLAY_INTERVAL * (2 ** attempts))
+            db.execute(
+                "UPDATE outbox SET state = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?",
+                (attempts, time.time() + random.uniform(delay / 2, delay), message, entry_id)
+            )
+
+    def claim_due(self):
+        """Mark the oldest due entry in flight and return it, or None"""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, url, payload, transport, audio FROM outbox "
+                "WHERE state = 'pending' AND next_attempt_at <= ? ORDER BY created_at LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = db.execute(
+                "UPDATE outbox SET state = 'inflight' WHERE id = ? AND state = 'pending'", (row[0],)
+            ).rowcount
+        if not claimed:
+            return None
+        entry_id, url, payload, transport, audio = row
+        return {
+            'id': entry_id,
+            'url': url,
+            'payload': json.loads(payload),
+            'transport': transport,
+            'audio': audio
+        }
+
+    def claim(self, entry_id):
+        """Mark one pending or dead-lettered entry in flight and return it, or None if it is gone or being sent"""
+        with self._connect() as db:
+            claimed = db.execute(
+                "UPDATE outbox SET state = 'inflight' WHERE id = ? AND state IN ('pending', 'dead')", (entry_id,)
+            ).rowcount
+            if not claimed:
+                return None
+            row = db.execute("SELECT url, payload, transport, audio FROM outbox WHERE id = ?",
+                             (entry_id,)).fetchone()
+        url, payload, transport, audio = row
+        return {
+            'id': entry_id,
+            'url': url,
+            'payload': json.loads(payload),
+            'transport': transport,
+            'audio': audio
+        }
+
+    def replace_audio(self, entry_id, payload, audio_bytes):
+        """Swap an entry's payload and audio, e.g. after transcoding"""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE outbox SET payload = ?, audio = ? WHERE id = ?",
+                (json.dumps(payload), audio_bytes, entry_id)
+            )
+
+    def discard(self, entry_id=None, owner=None):
+        """Drop one entry, or every entry of ``owner`` (by default of anyone) that is not being sent"""
+        with self._connect() as db:
+            if entry_id:
+                db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+            elif owner is not None:
+                db.execute("DELETE FROM outbox WHERE state IN ('pending', 'dead') AND owner = ?", (owner,))
+            else:
+                db.execute("DELETE FROM outbox WHERE state IN ('pending', 'dead')")
+
+    def entries(self, limit=20, owner=None):
+        """Summaries of the oldest undelivered entries, optionally only those of ``owner``"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, created_at, url, transport, length(audio), length(payload), state, attempts, "
+                "next_attempt_at, last_error FROM outbox WHERE ? IS NULL OR owner = ? ORDER BY created_at LIMIT ?",
+                (owner, owner, limit)
+            ).fetchall()
+        keys = ['id', 'created_at', 'url', 'transport', 'audio_size', 'payload_size', 'state',
+                'attempts', 'next_attempt_at', 'last_error']
+        return [dict(zip(keys, row)) for row in rows]
+
+    def count(self, owner=None):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM outbox WHERE ? IS NULL OR owner = ?", (owner, owner)).fetchone()[0]
+
+class OutboxReplayer:
+    """Drains the outbox one entry at a time at a fixed rate"""
+
+    def __init__(self, outbox, interval=OUTBOX_REPLAY_INTERVAL):
+        self.outbox = outbox
+        self.interval = interval
+        self.replayed = 0
+        threading.Thread(target=self._run, name="outbox-replayer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            entry = None
+            try:
+                entry = self.outbox.claim_due()
+                if entry is None:
+                    continue
+                audio_file = None
+                if entry['audio'] is not None:
+                    audio_file = io.BytesIO(entry['audio'])
+                # One attempt per replay; the outbox schedule provides the backoff
+                result = deliver_webhook(entry['url'], entry['payload'], audio_file, entry['transport'],
+                                         RetryPolicy(max_attempts=1))
+                self.outbox.settle(entry['id'], result)
+                if result[0]:
+                    self.replayed += 1
+            except Exception as e:
+                if entry is not None:
+                    self.outbox.settle(entry['id'], (False, f"Error: {str(e)}", {}))
+
+@st.cache_resource(show_spinner=False)
+def get_webhook_outbox():
+    """Durable outbox plus its replay worker, one per process"""
+    outbox = WebhookOutbox()
+    outbox.replayer = OutboxReplayer(outbox)
+    return outbox
+
+# Audio transcoding
+class AudioTranscoder:
+    """Runs ffmpeg to re-encode uploads as Opus/WebM at a target bitrate.
+
+    Each conversion is an ffmpeg subprocess, so the encoding itself already
+    runs outside this Python process; the bounded thread pool only caps how
+    many of those subprocesses run at once across all sessions.
+    """
+
+    def __init__(self, ffmpeg=FFMPEG_PATH, workers=TRANSCODE_WORKERS):
+        self.ffmpeg = shutil.which(ffmpeg)
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcode")
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    def transcode(self, audio_file, profile):
+        """Return an in-memory Opus/WebM copy of ``audio_file`` encoded with ``profile``"""
+        return self._pool.submit(self._run_ffmpeg, audio_file, profile).result()
+
+    def _run_ffmpeg(self, audio_file, profile):
+        with tempfile.TemporaryDirectory(prefix="bookbuddy-transcode-") as workdir:
+            source = os.path.join(workdir, "input")
+            target = os.path.join(workdir, "output.webm")
+            audio_file.seek(0)
+            with open(source, 'wb') as f:
+                shutil.copyfileobj(audio_file, f, UPLOAD_CHUNK_SIZE)
+            command = [
+                self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+                '-i', source, '-vn', '-map_metadata', '-1',
+                '-c:a', 'libopus', '-b:a', str(profile['bitrate']),
+                '-ac', str(profile['channels']), '-ar', str(profile['sample_rate']),
+                '-application', profile['application'],
+                '-f', 'webm', target
+            ]
+            result = subprocess.run(command, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()[-300:]}")
+            with open(target, 'rb') as f:
+                return io.BytesIO(f.read())
+
+@st.cache_resource(show_spinner=False)
+def get_audio_transcoder():
+    """Shared transcoder so the ffmpeg concurrency limit applies process-wide"""
+    return AudioTranscoder()
+
+def get_compression_policy():
+    """Request compression chosen in this session's configuration"""
+    return CompressionPolicy(st.session_state.request_encoding, st.session_state.compression_level)
+
+def get_fanout_urls():
+    """This session's additional webhook endpoints, valid and distinct from the primary URL"""
+    urls = []
+    for url in st.session_state.fanout_urls:
+        if validate_webhook_url(url) and url != st.session_state.webhook_url and url not in urls:
+            urls.append(url)
+    return urls
+
+def get_dedup_policy():
+    """Duplicate handling chosen in this session's configuration"""
+    return DedupPolicy(st.session_state.skip_duplicates, st.session_state.idempotency_keys)
+
+def get_audio_profile():
+    """Encoding settings for this session's Audio Quality selection"""
+    quality = st.session_state.audio_quality
+    if quality == 'Custom':
+        profile = {
+            'bitrate': int(st.session_state.custom_bitrate_kbps) * 1000,
+            'channels': int(st.session_state.custom_channels),
+            'sample_rate': int(st.session_state.custom_sample_rate),
+        }
+        profile['application'] = 'voip' if profile['bitrate'] <= 24000 else 'audio'
+    else:
+        profile = dict(AUDIO_QUALITY_PROFILES[quality])
+    profile['name'] = quality
+    return profile
+
+def describe_audio_profile(profile):
+    channels = 'mono' if profile['channels'] == 1 else 'stereo'
+    return f"{profile['bitrate'] // 1000} kbps {channels}, {profile['sample_rate'] / 1000:g} kHz"
+
+def is_uncompressed_audio(payload):
+    audio_format = (payload.get('audio_format') or '').lower()
+    filename = (payload.get('filename') or '').lower()
+    return audio_format in UNCOMPRESSED_AUDIO_TYPES or filename.endswith('.wav')
+
+def make_transcode_stage(profile, mode):
+    """Pipeline stage for WebhookDispatcher.submit, or None when transcoding is off"""
+    transcoder = get_audio_transcoder()
+    if mode == 'off' or not transcoder.available:
+        return None
+
+    def transcode_stage(payload, audio_file):
+        if audio_file is None or (mode == 'uncompressed' and not is_uncompressed_audio(payload)):
+            return payload, audio_file
+        started = time.time()
+        try:
+            encoded = transcoder.transcode(audio_file, profile)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            # Deliver the original rather than failing the upload
+            payload = dict(payload, transcode_error=str(e))
+            return payload, audio_file
+        audio_file.seek(0)
+        original_size = _stream_length(audio_file)
+        encoded_size = encoded.getbuffer().nbytes
+        if encoded_size >= original_size:
+            return payload, audio_file
         
-        <!-- Recording Stats -->
-        <div id="recordingStats" style="
-            display: none;
-            background: rgba(255,255,255,0.1);
-            padding: 15px;
-            border-radius: 12px;
-            margin: 20px 0;
-        ">
-            <div style="display: flex; justify-content: space-around; text-align: center;">
-                <div>
-                    <div style="font-size: 24px; font-weight: bold;" id="duration">00:00</div>
-                    <div style="font-size: 12px; opacity: 0.8;">Duration</div>
-                </div>
-                <div>
-                    <div style="font-size: 24px; font-weight: bold;" id="fileSize">0 KB</div>
-                    <div style="font-size: 12px; opacity: 0.8;">Size</div>
-                </div>
-                <div>
-                    <div style="font-size: 24px; font-weight: bold;" id="quality">High</div>
-                    <div style="font-size: 12px; opacity: 0.8;">Quality</div>
-                </div>
-            </div>
-        </div>
+        base_name = os.path.splitext(payload.get('filename') or 'audio')[0]
+        encoded.name = f"{base_name}.webm"
+        encoded.type = 'audio/webm'
+        payload = dict(payload)
+        payload.update({
+            'audio_format': 'audio/webm',
+            'filename': encoded.name,
+            'file_size': encoded_size,
+            'original_format': payload.get('audio_format'),
+            'original_size': original_size,
+            'transcoded': {
+                'codec': 'opus',
+                'profile': profile.get('name'),
+                'bitrate': profile['bitrate'],
+                'channels': profile['channels'],
+                'sample_rate': profile['sample_rate'],
+                'seconds': round(time.time() - started, 2)
+            }
+        })
+        return payload, encoded
+
+    return transcode_stage
+
+# Background webhook dispatch
+class QueueFullError(Exception):
+    """Raised when the dispatch queue cannot accept more jobs"""
+
+class WebhookJob:
+    """A queued webhook delivery and its eventual outcome"""
+
+    def __init__(self, url, payload, audio_file=None, transport='json', label='', retry_policy=None,
+                 outbox_id=None, prepare=None, compression=None, on_finish=None, dedup=None, extra_urls=()):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.outbox_id = outbox_id
+        self.prepare = prepare
+        self.on_finish = on_finish
+        self.url = url
+        self.extra_urls = tuple(extra_urls)
+        self.payload = payload
+        self.audio_file = audio_file
+        self.transport = transport
+        self.retry_policy = retry_policy
+        self.compression = compression
+        self.dedup = dedup
+        self.label = label or payload.get('source', 'webhook')
+        self.status = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.results = None  # one per endpoint, the primary first
+
+    @property
+    def finished(self):
+        return self.status in ('sent', 'failed')
+
+class WebhookDispatcher:
+    """Worker pool that delivers webhook payloads off the Streamlit script thread"""
+
+    def __init__(self, workers=WEBHOOK_WORKERS, max_queue=WEBHOOK_QUEUE_SIZE, outbox=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.outbox = outbox
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"webhook-worker-{i}", daemon=True).start()
+
+    def submit(self, url, payload, audio_file=None, transport='json', label='', retry_policy=None,
+               outbox_id=None, prepare=None, compression=None, on_finish=None, dedup=None, extra_urls=()):
+        """Queue a delivery and return its job id immediately
+
+        ``prepare`` is an optional pipeline stage run on the worker before
+        sending; it takes and returns ``(payload, audio_file)``. ``on_finish``
+        is called with the job on the worker thread once it has finished.
+        The payload is fanned out to ``extra_urls`` as well; the outbox entry
+        tracks the primary ``url``, and an endpoint that fails gets an entry
+        of its own so only it is replayed.
+        """
+        job = WebhookJob(url, payload, audio_file, transport, label, retry_policy, outbox_id, prepare, compression,
+                         on_finish, dedup, extra_urls)
+        self._prune()
+        with self._lock:
+            self._jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.job_id]
+            raise QueueFullError(f"Delivery queue is full ({self.max_queue} pending), try again shortly")
+        return job.job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id):
+        """Forget a finished job once its result has been collected"""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def _prune(self):
+        # Drop results nobody collected (e.g. the browser tab was closed)
+        cutoff = time.time() - WEBHOOK_JOB_RETENTION
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job.finished and job.finished_at < cutoff]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            try:
+                key_source = {}
+                if job.prepare is not None:
+                    job.status = 'preparing'
+                    key_source = self._key_source(job)
+                    payload, audio_file = job.prepare(job.payload, job.audio_file)
+                    if audio_file is not job.audio_file and self.outbox is not None and job.outbox_id:
+                        # Replays should send the prepared audio, not the original
+                        self.outbox.replace_audio(job.outbox_id, payload, audio_file.getbuffer())
+                    job.payload, job.audio_file = payload, audio_file
+                job.status = 'sending'
+                job.results = fan_out_webhook([job.url, *job.extra_urls], job.payload, job.audio_file, job.transport,
+                                              job.retry_policy, job.compression, job.dedup, **key_source)
+                job.result = job.results[0]
+            except Exception as e:
+                # Every endpoint missed this payload, so each gets parked for replay
+                job.results = [
+                    (False, f"Error: {str(e)}", {'error': str(e), 'endpoint': url,
+                                                 'timestamp': datetime.now().isoformat()})
+                    for url in (job.url, *job.extra_urls)
+                ]
+                job.result = job.results[0]
+            if self.outbox is not None and job.outbox_id:
+                try:
+                    self._park_failed_endpoints(job)
+                    self.outbox.settle(job.outbox_id, job.result)
+                except Exception as e:
+                    # Left in flight, the entry is replayed after the next restart
+                    logger.warning("Could not settle outbox entry %s: %s", job.outbox_id, e)
+            job.audio_file = None
+            job.finished_at = time.time()
+            job.status = 'sent' if job.result[0] else 'failed'
+            self._queue.task_done()
+            if job.on_finish is not None:
+                try:
+                    job.on_finish(job)
+                except Exception:
+                    pass  # a broken callback must not take the worker down
+
+    @staticmethod
+    def _key_source(job):
+        # Transcoded bytes and reports differ run to run, so duplicates are keyed by what was submitted
+        dedup = job.dedup or DedupPolicy()
+        if job.audio_file is None or not (dedup.skip_duplicates or dedup.idempotency_key):
+            return {}
+        started = time.perf_counter()
+        digest = audio_digest(job.audio_file)
+        return {'digest': digest, 'hash_seconds': time.perf_counter() - started, 'key_payload': dict(job.payload)}
+
+    def _park_failed_endpoints(self, job):
+        # Each failed additional endpoint gets its own outbox entry for the replay worker
+        audio_bytes = job.audio_file.getbuffer() if job.audio_file is not None else None
+        owner = self.outbox.owner_of(job.outbox_id) if job.extra_urls else None
+        for url, result in zip(job.extra_urls, job.results[1:]):
+            if not result[0]:
+                entry_id = self.outbox.add(url, job.payload, audio_bytes, job.transport, inflight=True, owner=owner)
+                self.outbox.settle(entry_id, result)
+
+@st.cache_resource(show_spinner=False)
+def get_webhook_dispatcher():
+    """Background delivery pool cached across reruns and sessions"""
+    return WebhookDispatcher(outbox=get_webhook_outbox())
+
+def queue_webhook(payload, audio_file=None, transport='json', label='', prepare=None):
+    """Persist and queue a delivery for this session, returning the job id or None when the queue is full"""
+    url = st.session_state.webhook_url
+    outbox = get_webhook_outbox()
+    if 'timestamp' not in payload:
+        payload['timestamp'] = datetime.now().isoformat()
+    audio_bytes = audio_file.getbuffer() if audio_file is not None else None
+    outbox_id = outbox.add(url, payload, audio_bytes, transport, inflight=True, owner=st.session_state.outbox_owner)
+    try:
+        job_id = get_webhook_dispatcher().submit(
+            url, payload, audio_file, transport, label,
+            RetryPolicy(max_attempts=st.session_state.max_attempts), outbox_id, prepare,
+            get_compression_policy(), dedup=get_dedup_policy(), extra_urls=get_fanout_urls()
+        )
+    except QueueFullError as e:
+        # Already persisted, so hand it to the replay worker instead of dropping it
+        outbox.release(outbox_id)
+        st.warning(f"⚠️ {e}. Saved to the outbox for later delivery.")
+        return None
+    st.session_state.pending_jobs.append(job_id)
+    return job_id
+
+def collect_finished_jobs():
+    """Move finished background deliveries into the response history"""
+    dispatcher = get_webhook_dispatcher()
+    finished = []
+    for job_id in list(st.session_state.pending_jobs):
+        job = dispatcher.get(job_id)
+        if job is None:
+            st.session_state.pending_jobs.remove(job_id)
+        elif job.finished:
+            dispatcher.pop(job_id)
+            st.session_state.pending_jobs.remove(job_id)
+            for result in job.results or [job.result]:
+                record_webhook_response(result[2])
+            finished.append(job)
+    return finished
+
+# Batch uploads
+def upload_payload(uploaded_file):
+    """Webhook payload for an uploaded audio file"""
+    return {
+        "title": st.session_state.recording_title or uploaded_file.name,
+        "description": st.session_state.recording_description,
+        "user_name": st.session_state.user_name,
+        "book_type": st.session_state.book_type,
+        "audio_format": uploaded_file.type,
+        "filename": uploaded_file.name,
+        "file_size": uploaded_file.size,
+        "source": "file_upload"
+    }
+
+class BatchItem:
+    """One file of a batch upload"""
+
+    def __init__(self, label, payload, audio_file, size, outbox_id):
+        self.label = label
+        self.payload = payload
+        self.audio_file = audio_file
+        self.size = size
+        self.outbox_id = outbox_id
+        self.status = 'waiting'
+        self.job_id = None
+        self.result = None
+        self.results = None
+        self.started_at = None
+        self.finished_at = None
+
+class BatchUpload:
+    """Sends a set of audio files through the delivery pool, ``concurrency`` at a time.
+
+    Every file is written to the outbox before anything is sent, so files
+    still waiting survive a restart and failed ones are resumed from the
+    outbox copy rather than kept in memory. A failed file is also left to
+    the outbox replay worker; resuming claims it back first, so it is never
+    sent twice.
+    """
+
+    def __init__(self, dispatcher, outbox, url, transport='json', retry_policy=None, compression=None,
+                 prepare=None, concurrency=BATCH_UPLOAD_CONCURRENCY, dedup=None, extra_urls=(), owner=None):
+        self.dispatcher = dispatcher
+        self.outbox = outbox
+        self.url = url
+        self.transport = transport
+        self.retry_policy = retry_policy
+        self.compression = compression
+        self.prepare = prepare
+        self.dedup = dedup
+        self.extra_urls = tuple(extra_urls)
+        self.owner = owner
+        self.concurrency = concurrency
+        self.items = []
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._unreported = deque()
+        self.run_started_at = None
+        self.run_finished_at = None
+        self.run_bytes = 0
+
+    def add(self, label, payload, audio_file):
+        """Persist one file and add it to the batch"""
+        if 'timestamp' not in payload:
+            payload['timestamp'] = datetime.now().isoformat()
+        audio_bytes = audio_file.getbuffer()
+        outbox_id = self.outbox.add(self.url, payload, audio_bytes, self.transport, inflight=True, owner=self.owner)
+        self.items.append(BatchItem(label, payload, audio_file, len(audio_bytes), outbox_id))
+
+    def start(self, items=None):
+        """Send ``items`` (by default the whole batch) on a feeder thread"""
+        items = list(self.items if items is None else items)
+        with self._lock:
+            for item in items:
+                item.status = 'waiting'
+                item.result = None
+            self.run_started_at = time.time()
+            self.run_finished_at = None
+            self.run_bytes = 0
+        threading.Thread(target=self._feed, args=(items,), name="batch-upload", daemon=True).start()
+
+    def _feed(self, items):
+        for item in items:
+            self._slots.acquire()
+            item.status = 'queued'
+            item.started_at = time.time()
+            try:
+                item.job_id = self.dispatcher.submit(
+                    self.url, item.payload, item.audio_file, self.transport, item.label, self.retry_policy,
+                    item.outbox_id, self.prepare, self.compression,
+                    on_finish=functools.partial(self._job_finished, item), dedup=self.dedup,
+                    extra_urls=self.extra_urls
+                )
+            except QueueFullError as e:
+                # Already persisted, so the replay worker delivers it later
+                self.outbox.release(item.outbox_id)
+                self._slots.release()
+                self._settle(item, (False, f"{e}; left in the outbox",
+                                     {'error': str(e), 'timestamp': datetime.now().isoformat()}))
+                continue
+            except Exception as e:
+                # Never keep the slot or leave the remaining files waiting on a feeder that died
+                self._slots.release()
+                try:
+                    self.outbox.release(item.outbox_id)
+                except Exception:
+                    pass  # still in flight; replayed after the next restart
+                self._settle(item, (False, f"Error: {str(e)}",
+                                     {'error': str(e), 'timestamp': datetime.now().isoformat()}))
+                continue
+            item.audio_file = None  # the job holds it until it is sent
+
+    def _job_finished(self, item, job):
+        self.dispatcher.pop(job.job_id)
+        self._slots.release()
+        self._settle(item, job.result, job.results)
+
+    def _settle(self, item, result, results=None):
+        with self._lock:
+            item.result = result
+            item.results = results or [result]
+            item.finished_at = time.time()
+            item.status = 'sent' if result[0] else 'failed'
+            if result[0] and not result[2].get('deduplicated'):
+                self.run_bytes += item.size
+            self._unreported.append(item)
+            if all(other.status in ('sent', 'failed', 'outbox') for other in self.items):
+                self.run_finished_at = item.finished_at
+
+    def resume_failed(self):
+        """Send the failed files again, returning how many were resumed"""
+        items = []
+        for item in self.items:
+            if item.status != 'failed':
+                continue
+            entry = self.outbox.claim(item.outbox_id)
+            if entry is None:
+                # Already delivered or being replayed from the outbox
+                item.status = 'outbox'
+                continue
+            item.payload = entry['payload']
+            item.audio_file = io.BytesIO(entry['audio']) if entry['audio'] is not None else None
+            items.append(item)
+        if items:
+            self.start(items)
+        return len(items)
+
+    def take_finished(self):
+        """Items that finished since the last call, for the response history"""
+        with self._lock:
+            finished = list(self._unreported)
+            self._unreported.clear()
+        return finished
+
+    def item_status(self, item):
+        """Status of one file, including the delivery pool's preparing/sending stages"""
+        if item.status == 'queued' and item.job_id is not None:
+            job = self.dispatcher.get(item.job_id)
+            if job is not None and not job.finished:
+                return job.status
+        return item.status
+
+    def progress(self):
+        """Counts, bytes and throughput of the current run"""
+        with self._lock:
+            counts = {}
+            for item in self.items:
+                counts[item.status] = counts.get(item.status, 0) + 1
+            end = self.run_finished_at or time.time()
+            elapsed = end - self.run_started_at if self.run_started_at else 0.0
+            return {
+                'total': len(self.items),
+                'sent': counts.get('sent', 0),
+                'failed': counts.get('failed', 0),
+                'outbox': counts.get('outbox', 0),
+                'done': self.run_finished_at is not None,
+                'bytes_total': sum(item.size for item in self.items),
+                'bytes_sent': sum(item.size for item in self.items if item.status == 'sent'),
+                'elapsed': elapsed,
+                'throughput': self.run_bytes / elapsed if elapsed else 0.0
+            }
+
+def start_upload_batch(uploaded_files):
+    """Queue several uploaded files as one batch for this session, returning it"""
+    batch = BatchUpload(
+        get_webhook_dispatcher(), get_webhook_outbox(), st.session_state.webhook_url,
+        st.session_state.upload_transport, RetryPolicy(max_attempts=st.session_state.max_attempts),
+        get_compression_policy(), make_transcode_stage(get_audio_profile(), st.session_state.transcode_mode),
+        dedup=get_dedup_policy(), extra_urls=get_fanout_urls(), owner=st.session_state.outbox_owner
+    )
+    for uploaded_file in uploaded_files:
+        batch.add(uploaded_file.name, upload_payload(uploaded_file), uploaded_file)
+    batch.start()
+    st.session_state.upload_batch = batch
+    return batch
+
+# Voice recorder component (static assets in frontend/voice_recorder, served once per browser)
+RECORDER_COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "voice_recorder")
+_voice_recorder_component = components.declare_component("voice_recorder", path=RECORDER_COMPONENT_DIR)
+
+def render_voice_recorder():
+    """Mount the enhanced voice recorder and return its latest delivery report
+
+    Settings are passed as component args, so reruns only post new args to
+    the already-loaded iframe instead of rebuilding and remounting it, and an
+    in-progress recording survives edits to the other widgets.
+    """
+    return _voice_recorder_component(
+        webhook_url=st.session_state.webhook_url,
+        title=st.session_state.recording_title,
+        description=st.session_state.recording_description,
+        user_name=st.session_state.user_name,
+        book_type=st.session_state.book_type,
+        auto_send=st.session_state.auto_send,
+        transport=st.session_state.upload_transport,
+        profile=get_audio_profile(),
+        ingest_url=get_ingest_upload_url(),
+        segment_ms=int(INGEST_SEGMENT_SECONDS * 1000),
+        outbox_replay_ms=int(OUTBOX_REPLAY_INTERVAL * 1000),
+        retry_client_statuses=sorted(OUTBOX_RETRY_CLIENT_STATUSES),
+        key="voice_recorder",
+        default=None
+    )
+
+def handle_recorder_report(report):
+    """Record a browser-side delivery in the response history once"""
+    if not report or report.get('event_id') == st.session_state.get('last_recorder_event'):
+        return
+    st.session_state.last_recorder_event = report['event_id']
+    st.session_state.last_recording = report
+    if report.get('upload_mode') == 'chunked':
+        # Delivered server-side; the delivery queue picks up the job
+        return
+    response_data = {
+        'timestamp': report.get('timestamp') or datetime.now().isoformat(),
+        'status_code': report.get('status'),
+        'success': bool(report.get('success')),
+        'payload_size': report.get('payload_size'),
+        'error': report.get('error'),
+        'elapsed': report.get('elapsed'),
+        'response_text': report.get('response'),
+        'source': 'browser_recorder'
+    }
+    record_webhook_response({key: value for key, value in response_data.items() if value is not None})
+
+
+def new_export_path(suffix):
+    """Reserve a temporary file for an exported document"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="bookbuddy-", suffix=suffix, dir=EXPORT_DIR)
+    os.close(fd)
+    return path
+
+def read_export(path):
+    """Read an exported file when its download button is clicked"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return b''
+
+# Generated document cache
+class ArtifactCache:
+    """Disk cache of generated documents keyed by a hash of their inputs.
+
+    Identical exports (same content, metadata and style options) are served
+    from disk for every session. Entries are evicted least recently used
+    first once the cache grows past ``max_bytes``; a hit refreshes the
+    entry's modification time, which is what eviction orders by. An entry
+    is the artifact plus its ``.json`` sidecar; the two are evicted
+    together, and one found without the other is a miss that is cleaned up.
+    """
+
+    def __init__(self, directory=ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(kind, content, metadata, options=None):
+        """Stable hash of everything that affects a generated document"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([kind, metadata, options or {}], sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update((content or '').encode('utf-8'))
+        return digest.hexdigest()
+
+    def _paths(self, key, suffix):
+        base = os.path.join(self.directory, key)
+        return base + suffix, base + '.json'
+
+    def get(self, key, suffix):
+        """Return (path, info) for a cached artifact, or (None, None)"""
+        path, info_path = self._paths(key, suffix)
+        with self._lock:
+            try:
+                with open(info_path) as f:
+                    info = json.load(f)
+                os.utime(path)
+                os.utime(info_path)
+            except (FileNotFoundError, ValueError):
+                self.misses += 1
+                # Half an entry (e.g. after a crash mid-eviction) is useless, so drop what is left
+                self._remove(path, info_path)
+                return None, None
+            self.hits += 1
+        return path, info
+
+    def put(self, key, suffix, source_path, info):
+        """Move a freshly rendered file into the cache and return its cached path"""
+        path, info_path = self._paths(key, suffix)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)  # tmp cleaners may have removed it
+            os.replace(source_path, path)
+            with open(info_path + '.tmp', 'w') as f:
+                json.dump(info, f)
+            os.replace(info_path + '.tmp', info_path)
+            self._evict(keep=(path, info_path))
+        return path
+
+    @staticmethod
+    def _remove(*paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        """(mtime, bytes, paths) per cache key, the artifact listed before its sidecar"""
+        groups = {}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            group = groups.setdefault(name.split('.', 1)[0], [0.0, 0, []])
+            group[0] = max(group[0], stat.st_mtime)
+            group[1] += stat.st_size
+            group[2].append(path)
+        return [(mtime, size, sorted(paths, key=lambda path: path.endswith('.json')))
+                for mtime, size, paths in groups.values()]
+
+    def _evict(self, keep=()):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, paths in entries:
+            if total <= self.max_bytes:
+                break
+            if any(path in keep for path in paths):
+                continue
+            self._remove(*paths)
+            total -= size
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'files': len([paths for _, _, paths in entries if not paths[0].endswith('.json')]),
+            'bytes': sum(size for _, size, _ in entries)
+        }
+
+@st.cache_resource(show_spinner=False)
+def get_artifact_cache():
+    """Generated document cache shared by every session"""
+    return ArtifactCache()
+
+@st.cache_resource(show_spinner=False)
+def load_exporters():
+    """Import the export engine on first use; ReportLab and ebooklib load later still, per format"""
+    import exporters
+    return exporters
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def get_content_stats(content):
+    """Manuscript statistics, computed once per distinct content across reruns and sessions"""
+    return load_exporters().manuscript_stats(content)
+
+# Background document rendering
+class RenderJob:
+    """A document render running in the process pool"""
+
+    def __init__(self, kind, output, finish=None, label='', paragraphs=0):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.output = output
+        self.finish = finish
+        self.label = label or kind.upper()
+        self.paragraphs = paragraphs  # rough total, for the progress bar
+        self.status = 'queued'
+        self.progress = {}
+        self.future = None
+        self.cancel_event = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.worker = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+class RenderPool:
+    """Process pool that renders documents outside the Streamlit server process
+
+    Renders run in ``workers`` spawned processes, so a large ReportLab
+    build neither blocks a session's script thread nor holds the server's
+    GIL. Workers report progress through a manager queue that a listener
+    thread folds into each job; cancelling sets the job's manager event,
+    which the worker checks between paragraphs and pages.
+
+    Each worker is its own single-process executor so a manuscript can be
+    routed back to the worker that last rendered it: the PDF and EPUB of
+    the same text then share that worker's parse_manuscript cache instead
+    of each spawned process parsing it again. Manuscripts the pool has not
+    seen recently go to the least busy worker.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, max_queue=RENDER_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._context = multiprocessing.get_context('spawn')
+        self._manager = self._context.Manager()
+        self._updates = self._manager.Queue()
+        self._executors = [self._new_executor() for _ in range(workers)]
+        self._affinity = OrderedDict()  # content digest -> worker index, most recent last
+        self._jobs = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._listen, name="render-progress", daemon=True).start()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=1, mp_context=self._context)
+
+    def _pick_worker(self, content):
+        """Worker that last rendered ``content``, else the one with the fewest unfinished jobs; call with the lock"""
+        digest = hashlib.sha1(content.encode('utf-8')).digest()
+        worker = self._affinity.pop(digest, None)
+        if worker is None:
+            busy = [0] * self.workers
+            for job in self._jobs.values():
+                if job.worker is not None and not job.finished:
+                    busy[job.worker] += 1
+            worker = busy.index(min(busy))
+        self._affinity[digest] = worker
+        # parse_manuscript keeps the last 4 manuscripts per process
+        while len(self._affinity) > 4 * self.workers:
+            self._affinity.popitem(last=False)
+        return worker
+
+    def submit(self, kind, content, metadata, output, finish=None, label='', options=None):
+        """Start rendering ``content`` into ``output`` and return the job id immediately
+
+        ``finish`` is called with the render stats once the file is complete
+        and returns the path to serve (e.g. after moving it into a cache).
+        ``options`` are passed through to the renderer (e.g. ``layout``).
+        """
+        self._prune()
+        job = RenderJob(kind, output, finish, label, paragraphs=content.count('\n\n') + 1)
+        with self._lock:
+            active = sum(1 for other in self._jobs.values() if not other.finished)
+            if active >= self.workers + self.max_queue:
+                raise QueueFullError(f"Render queue is full ({active} documents in progress), try again shortly")
+            job.worker = self._pick_worker(content)
+            self._jobs[job.job_id] = job
+        job.cancel_event = self._manager.Event()
+        args = (load_exporters().run_render_job, job.job_id, kind, content, metadata, output,
+                self._updates, job.cancel_event, options)
+        try:
+            job.future = self._executors[job.worker].submit(*args)
+        except BrokenProcessPool:
+            # The worker died (e.g. killed for memory); start a fresh one in its place
+            self._executors[job.worker] = self._new_executor()
+            job.future = self._executors[job.worker].submit(*args)
+        job.future.add_done_callback(functools.partial(self._finish, job))
+        return job.job_id
+
+    def cancel(self, job_id):
+        """Cancel a queued render, or ask a running one to stop"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return
+        if not job.future.cancel():
+            job.cancel_event.set()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id):
+        """Forget a finished job once its result has been collected"""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        cutoff = time.time() - WEBHOOK_JOB_RETENTION
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job.finished and job.finished_at < cutoff]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+    def _listen(self):
+        while True:
+            try:
+                job_id, counts = self._updates.get()
+            except (EOFError, OSError):
+                return  # manager shut down with the server
+            job = self.get(job_id)
+            if job is not None and not job.finished:
+                job.progress = counts
+                job.status = 'rendering'
+
+    def _finish(self, job, future):
+        try:
+            stats = future.result()
+            path = job.finish(stats) if job.finish is not None else job.output
+            job.result = {'path': path, 'stats': stats}
+            status = 'done'
+        except (CancelledError, load_exporters().RenderCancelled):
+            status = 'cancelled'
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            status = 'failed'
+        if status != 'done' and os.path.exists(job.output):
+            os.remove(job.output)
+        job.finished_at = time.time()
+        job.status = status
+
+@st.cache_resource(show_spinner=False)
+def get_render_pool():
+    """Document render pool shared by every session"""
+    return RenderPool()
+
+# Export formats: file suffix, MIME type
+EXPORT_FORMATS = {
+    'pdf': ('.pdf', 'application/pdf'),
+    'epub': ('.epub', 'application/epub+zip')
+}
+
+def start_export(kind, content, metadata, options=None):
+    """Return (export, job_id): a cached export straight away, or a render job that fills the cache"""
+    suffix, _ = EXPORT_FORMATS[kind]
+    version = load_exporters().RENDERER_VERSIONS[kind]
+    cache = get_artifact_cache()
+    key = cache.key(kind, content, metadata, dict(options or {}, renderer=version))
+    path, stats = cache.get(key, suffix)
+    if path is not None:
+        return {'path': path, 'stats': stats, 'cached': True}, None
+    
+    output = new_export_path(suffix)
+    try:
+        job_id = get_render_pool().submit(
+            kind, content, metadata, output,
+            finish=functools.partial(cache.put, key, suffix, output),
+            label=metadata.get('title', ''),
+            options=options
+        )
+    except QueueFullError:
+        os.remove(output)
+        raise
+    return None, job_id
+
+def describe_export(stats, cached):
+    """One-line summary of an export's size and render speed"""
+    if 'pages' in stats:
+        summary = f"{stats['pages']} pages"
+        render_note = f"{stats['seconds']:.1f}s ({stats['pages_per_second']:.1f} pages/s)"
+    else:
+        summary = f"{stats['chapters']} chapters"
+        render_note = f"{stats['seconds']:.1f}s"
+    if cached:
+        render_note = "served from cache"
+    return f"{summary} • {format_file_size(stats['bytes'])} • {render_note}"
+
+# Chunked recording ingest
+_INGEST_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+class RecordingIngest:
+    """Receives recordings as numbered segments and delivers them once complete.
+
+    The browser PUTs each segment while recording is still going on, so only
+    the final segment is left to upload when the user presses stop. Segments
+    are spooled to disk and acknowledged with the highest contiguous sequence
+    number, which is also what a reconnecting client asks for to resume.
+
+    Uploads are scoped to a ticket issued per Streamlit session; the ticket
+    carries the webhook URL and delivery settings, so the browser cannot
+    choose where the server forwards audio.
+    """
+
+    def __init__(self, dispatcher, outbox, spool_dir=INGEST_SPOOL_DIR, public_url=INGEST_PUBLIC_URL):
+        self.dispatcher = dispatcher
+        self.outbox = outbox
+        self.spool_dir = spool_dir
+        self.public_url = public_url.rstrip('/')
+        self._lock = threading.Lock()
+        self._tickets = {}
+        self._recordings = {}
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def register(self, ticket=None, **settings):
+        """Create or refresh a session's upload ticket and return it"""
+        self._expire()
+        with self._lock:
+            if ticket not in self._tickets:
+                ticket = secrets.token_urlsafe(24)
+                self._tickets[ticket] = {'jobs': []}
+            self._tickets[ticket].update(settings, seen=time.time())
+        return ticket
+
+    def upload_url(self, ticket):
+        return f"{self.public_url}/uploads/{ticket}"
+
+    def take_jobs(self, ticket):
+        """Job ids of recordings delivered for a ticket since the last call"""
+        with self._lock:
+            record = self._tickets.get(ticket)
+            if record is None:
+                return []
+            jobs, record['jobs'] = record['jobs'], []
+            return jobs
+
+    def receiving(self, ticket, within=60):
+        """Whether a recording for this ticket got a segment in the last ``within`` seconds and is not complete yet"""
+        cutoff = time.time() - max(within, 3 * INGEST_SEGMENT_SECONDS)
+        with self._lock:
+            return any(key[0] == ticket and rec['updated'] >= cutoff for key, rec in self._recordings.items())
+
+    def _expire(self):
+        cutoff = time.time() - INGEST_TICKET_TTL
+        with self._lock:
+            for ticket in [t for t, record in self._tickets.items() if record['seen'] < cutoff]:
+                del self._tickets[ticket]
+            stale = [key for key, rec in self._recordings.items() if rec['updated'] < cutoff]
+            for key in stale:
+                del self._recordings[key]
+        for key in stale:
+            shutil.rmtree(self._recording_dir(*key), ignore_errors=True)
+
+    def _recording_dir(self, ticket, recording_id):
+        return os.path.join(self.spool_dir, ticket, recording_id)
+
+    def _recording(self, ticket, recording_id):
+        if ticket not in self._tickets or not _INGEST_ID.match(recording_id):
+            raise KeyError(recording_id)
+        key = (ticket, recording_id)
+        if key not in self._recordings:
+            self._recordings[key] = {'acked': -1, 'received': set(), 'bytes': 0, 'updated': time.time()}
+        return self._recordings[key]
+
+    def acked(self, ticket, recording_id):
+        """Highest contiguous segment received, -1 when nothing arrived yet"""
+        with self._lock:
+            return self._recording(ticket, recording_id)['acked']
+
+    def store_segment(self, ticket, recording_id, seq, data):
+        """Spool one segment to disk and return the new acknowledgement"""
+        if not 0 <= seq < INGEST_MAX_SEGMENTS:
+            raise ValueError(f"Segment number out of range: {seq}")
+        with self._lock:
+            self._recording(ticket, recording_id)
+        directory = self._recording_dir(ticket, recording_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{seq:06d}.part")
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            recording = self._recording(ticket, recording_id)
+            if seq not in recording['received']:
+                recording['received'].add(seq)
+                recording['bytes'] += len(data)
+            while recording['acked'] + 1 in recording['received']:
+                recording['acked'] += 1
+            recording['updated'] = time.time()
+            self._tickets[ticket]['seen'] = time.time()
+            return recording['acked']
+
+    def complete(self, ticket, recording_id, segments, payload):
+        """Assemble a finished recording and queue it for delivery"""
+        if isinstance(segments, bool) or not isinstance(segments, int) or not 1 <= segments <= INGEST_MAX_SEGMENTS:
+            raise ValueError(f"Segment count out of range: {segments!r}")
+        if not isinstance(payload, dict):
+            raise ValueError("Payload must be a JSON object")
+        with self._lock:
+            recording = self._recording(ticket, recording_id)
+            if recording['acked'] + 1 < segments:
+                raise ValueError(f"Missing segments: have {recording['acked'] + 1} of {segments}")
+            settings = dict(self._tickets[ticket])
         
-        <!-- Audio Playback -->
-        <div id="playbackContainer" style="display: none; margin: 25px 0;">
-            <div style="margin-bottom: 15px; text-align: center;">
-                <strong>🎵 Recording Playback</strong>
-            </div>
-            <audio id="audioPlayback" controls style="
-                width: 100%;
-                border-radius: 10px;
-                background: rgba(255,255,255,0.1);
-            "></audio>
-        </div>
+        directory = self._recording_dir(ticket, recording_id)
+        audio = io.BytesIO()
+        for seq in range(segments):
+            with open(os.path.join(directory, f"{seq:06d}.part"), 'rb') as part:
+                shutil.copyfileobj(part, audio)
+        audio.name = f"{recording_id}.webm"
         
-        <!-- Webhook Status -->
-        <div id="webhookStatus" style="
-            display: none;
-            padding: 15px;
-            border-radius: 12px;
-            margin: 20px 0;
-            text-align: center;
-            font-weight: 600;
-        "></div>
+        payload = dict(payload)
+        payload.update({
+            'audio_format': payload.get('audio_format') or 'audio/webm',
+            'filename': audio.name,
+            'file_size': audio.getbuffer().nbytes,
+            'upload_mode': 'chunked',
+            'segments': segments
+        })
+        payload.setdefault('timestamp', datetime.now().isoformat())
         
-        <!-- Progress Bar -->
-        <div id="progressContainer" style="display: none; margin: 20px 0;">
-            <div style="background: rgba(255,255,255,0.2); border-radius: 10px; overflow: hidden;">
-                <div id="progressBar" style="
-                    background: linear-gradient(45deg, #4CAF50, #45a049);
-                    height: 8px;
-                    width: 0%;
-                    transition: width 0.3s ease;
-                "></div>
-            </div>
-            <div id="progressText" style="text-align: center; margin-top: 10px; font-size: 14px;"></div>
-        </div>
+        # The outbox now owns the audio, so the spooled segments can go
+        outbox_id = self.outbox.add(settings['url'], payload, audio.getbuffer(), settings['transport'], inflight=True,
+                                    owner=settings.get('owner'))
+        with self._lock:
+            self._recordings.pop((ticket, recording_id), None)
+        shutil.rmtree(directory, ignore_errors=True)
         
-        <textarea id="base64output" style="display: none;"></textarea>
-    </div>
+        try:
+            job_id = self.dispatcher.submit(
+                settings['url'], payload, audio, settings['transport'],
+                payload.get('title') or 'Voice recording',
+                RetryPolicy(max_attempts=settings['max_attempts']), outbox_id,
+                extra_urls=settings.get('extra_urls', ())
+            )
+        except QueueFullError:
+            self.outbox.release(outbox_id)
+            return None, payload['file_size']
+        with self._lock:
+            if ticket in self._tickets:
+                self._tickets[ticket]['jobs'].append(job_id)
+        return job_id, payload['file_size']
 
-    <script>
-    let mediaRecorder;
-    let audioChunks = [];
-    let isRecording = false;
-    let recordingTimer;
-    let seconds = 0;
-    let audioContext;
-    let analyser;
-    let dataArray;
-    let animationId;
-    let stream;
-
-    const recordBtn = document.getElementById("recordBtn");
-    const stopBtn = document.getElementById("stopBtn");
-    const statusDisplay = document.getElementById("statusDisplay");
-    const playback = document.getElementById("audioPlayback");
-    const base64output = document.getElementById("base64output");
-    const waveformContainer = document.getElementById("waveformContainer");
-    const waveform = document.getElementById("waveform");
-    const recordingStats = document.getElementById("recordingStats");
-    const playbackContainer = document.getElementById("playbackContainer");
-    const webhookStatus = document.getElementById("webhookStatus");
-    const progressContainer = document.getElementById("progressContainer");
-    const progressBar = document.getElementById("progressBar");
-    const progressText = document.getElementById("progressText");
-    
-    const durationSpan = document.getElementById("duration");
-    const fileSizeSpan = document.getElementById("fileSize");
-    const qualitySpan = document.getElementById("quality");
-
-    function updateProgress(percent, text) {{
-        progressContainer.style.display = 'block';
-        progressBar.style.width = percent + '%';
-        progressText.textContent = text;
-        
-        if (percent >= 100) {{
-            setTimeout(() => {{
-                progressContainer.style.display = 'none';
-            }}, 2000);
-        }}
-    }}
+class IngestRequestHandler(BaseHTTPRequestHandler):
+    """HTTP routes for chunked uploads under /uploads/<ticket>/<recording_id>, plus /metrics"""
 
-    function showWebhookStatus(message, isSuccess = true) {{
-        webhookStatus.style.display = 'block';
-        webhookStatus.textContent = message;
-        webhookStatus.style.background = isSuccess 
-            ? 'rgba(76, 175, 80, 0.8)' 
-            : 'rgba(244, 67, 54, 0.8)';
-        
-        setTimeout(() => {{
-            webhookStatus.style.display = 'none';
-        }}, 5000);
-    }}
+    protocol_version = 'HTTP/1.1'
+    ingest = None
+    metrics = None
+    allowed_origins = frozenset()
 
-    function updateButtonStyles() {{
-        if (isRecording) {{
-            recordBtn.style.background = "linear-gradient(45deg, #666, #888)";
-            recordBtn.style.cursor = "not-allowed";
-            recordBtn.style.transform = "scale(0.95)";
-            recordBtn.style.boxShadow = "0 4px 15px rgba(0,0,0,0.2)";
-            
-            stopBtn.style.background = "linear-gradient(45deg, #ff4757, #ff6b6b)";
-            stopBtn.style.cursor = "pointer";
-            stopBtn.style.boxShadow = "0 8px 25px rgba(255, 71, 87, 0.5)";
-            stopBtn.style.transform = "scale(1.05)";
-        }} else {{
-            recordBtn.style.background = "linear-gradient(45deg, #ff6b6b, #ff8e8e)";
-            recordBtn.style.cursor = "pointer";
-            recordBtn.style.transform = "scale(1)";
-            recordBtn.style.boxShadow = "0 8px 25px rgba(255, 107, 107, 0.4)";
-            
-            stopBtn.style.background = "linear-gradient(45deg, #666, #888)";
-            stopBtn.style.cursor = "not-allowed";
-            stopBtn.style.transform = "scale(0.95)";
-            stopBtn.style.boxShadow = "0 4px 15px rgba(0,0,0,0.2)";
-        }}
-    }}
+    def log_message(self, format, *args):
+        pass
 
-    function startTimer() {{
-        seconds = 0;
-        recordingStats.style.display = 'block';
-        recordingTimer = setInterval(() => {{
-            seconds++;
-            const mins = Math.floor(seconds / 60);
-            const secs = seconds % 60;
-            durationSpan.textContent = `${{mins.toString().padStart(2, '0')}}:${{secs.toString().padStart(2, '0')}}`;
-            statusDisplay.innerHTML = `🔴 Recording... ${{mins}}:${{secs.toString().padStart(2, '0')}}`;
-        }}, 1000);
-    }}
+    def _send_cors_headers(self):
+        # Only the app's own pages may call these routes from a browser
+        origin = self.headers.get('Origin')
+        if origin in self.allowed_origins:
+            self.send_header('Access-Control-Allow-Origin', origin)
+        self.send_header('Vary', 'Origin')
 
-    function stopTimer() {{
-        clearInterval(recordingTimer);
-    }}
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self._send_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
 
-    function createWaveformBars() {{
-        waveform.innerHTML = '';
-        for(let i = 0; i < 30; i++) {{
-            const bar = document.createElement('div');
-            bar.style.cssText = `
-                width: 4px;
-                background: linear-gradient(to top, #ff6b6b, #ff8e8e, #ffffff);
-                border-radius: 2px;
-                transition: height 0.1s ease;
-                height: 10px;
-            `;
-            waveform.appendChild(bar);
-        }}
-    }}
+    def _route(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) < 3 or parts[0] != 'uploads':
+            return None
+        return parts[1:]
 
-    function drawWaveform() {{
-        if (!analyser || !isRecording) return;
-        
-        analyser.getByteFrequencyData(dataArray);
-        const bars = waveform.children;
-        
-        for(let i = 0; i < bars.length; i++) {{
-            const barHeight = (dataArray[i * 4] / 255) * 70 + 10;
-            bars[i].style.height = barHeight + 'px';
-        }}
-        
-        animationId = requestAnimationFrame(drawWaveform);
-    }}
+    def _read_body(self, limit):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > limit:
+            raise ValueError(f"Body too large ({length} bytes)")
+        return self.rfile.read(length)
 
-    async function sendAudioToWebhook(base64String) {{
-        console.log('Preparing to send audio to webhook...');
-        updateProgress(10, 'Preparing payload...');
-        
-        const payload = {{
-            timestamp: new Date().toISOString(),
-            title: "{title}" || "Voice Recording",
-            description: "{description}" || "Audio recording from Book Buddy",
-            user_name: "{user_name}",
-            book_type: "{book_type}",
-            audio_data: base64String,
-            audio_format: 'audio/webm',
-            recording_duration: seconds,
-            file_size: Math.round(base64String.length * 0.75),
-            metadata: {{
-                quality: "High",
-                auto_sent: true,
-                app_version: "1.1.0",
-                browser: navigator.userAgent.split(' ').slice(-2).join(' ')
-            }},
-            source: 'enhanced_voice_recording',
-            app_name: 'Book Buddy Enhanced'
-        }};
-
-        updateProgress(30, 'Sending to webhook...');
-        
-        try {{
-            console.log('Sending to webhook:', '{webhook_url}');
-            
-            const response = await fetch('{webhook_url}', {{
-                method: 'POST',
-                headers: {{
-                    'Content-Type': 'application/json',
-                    'User-Agent': 'Book-Buddy-Enhanced/1.1.0'
-                }},
-                body: JSON.stringify(payload)
-            }});
-            
-            updateProgress(80, 'Processing response...');
-            
-            if (response.ok) {{
-                const responseText = await response.text();
-                console.log('Webhook success:', response.status);
-                
-                updateProgress(100, 'Successfully sent!');
-                showWebhookStatus('✅ Audio sent successfully to n8n webhook!', true);
-                
-                // Store success info for Streamlit
-                window.lastWebhookResponse = {{
-                    success: true,
-                    status: response.status,
-                    response: responseText,
-                    timestamp: new Date().toISOString(),
-                    payload_size: JSON.stringify(payload).length
-                }};
-                
-            }} else {{
-                throw new Error(`HTTP ${{response.status}}: ${{await response.text()}}`);
-            }}
-        }} catch (error) {{
-            console.error('Webhook error:', error);
-            updateProgress(0, '');
-            showWebhookStatus(`❌ Failed to send: ${{error.message}}`, false);
-            
-            // Store error info for Streamlit
-            window.lastWebhookResponse = {{
-                success: false,
-                error: error.message,
-                timestamp: new Date().toISOString()
-            }};
-        }}
-    }}
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._send_cors_headers()
+        self.send_header('Access-Control-Allow-Methods', 'GET, PUT, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Max-Age', '86400')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
 
-    recordBtn.onclick = async () => {{
-        console.log('Starting recording...');
-        try {{
-            stream = await navigator.mediaDevices.getUserMedia({{ 
-                audio: {{
-                    echoCancellation: true,
-                    noiseSuppression: true,
-                    autoGainControl: true,
-                    sampleRate: 44100
-                }}
-            }});
-            
-            // Setup audio context for visualization
-            audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            analyser = audioContext.createAnalyser();
-            const source = audioContext.createMediaStreamSource(stream);
-            source.connect(analyser);
-            analyser.fftSize = 256;
-            dataArray = new Uint8Array(analyser.frequencyBinCount);
-            
-            mediaRecorder = new MediaRecorder(stream, {{
-                mimeType: 'audio/webm;codecs=opus'
-            }});
-            
-            audioChunks = [];
-            isRecording = true;
-            
-            mediaRecorder.ondataavailable = e => {{
-                audioChunks.push(e.data);
-                fileSizeSpan.textContent = formatFileSize(e.data.size);
-            }};
-            
-            mediaRecorder.onstop = async () => {{
-                console.log('Recording stopped, processing...');
-                const blob = new Blob(audioChunks, {{ type: 'audio/webm' }});
-                
-                statusDisplay.innerHTML = "🔄 Processing audio...";
-                
-                const arrayBuffer = await blob.arrayBuffer();
-                const base64String = btoa(String.fromCharCode(...new Uint8Array(arrayBuffer)));
-                
-                base64output.value = base64String;
-                playback.src = URL.createObjectURL(blob);
-                playbackContainer.style.display = 'block';
-                
-                statusDisplay.innerHTML = "✅ Recording complete!";
-                waveformContainer.style.display = 'none';
-                
-                // Auto-send if enabled
-                if ({str(auto_send).lower()}) {{
-                    statusDisplay.innerHTML = "📤 Auto-sending to webhook...";
-                    await sendAudioToWebhook(base64String);
-                }} else {{
-                    statusDisplay.innerHTML = "✅ Recording ready (auto-send disabled)";
-                }}
-                
-                // Cleanup
-                stream.getTracks().forEach(track => track.stop());
-                if (audioContext) {{
-                    audioContext.close();
-                }}
-            }};
-
-            mediaRecorder.start(100);
-            startTimer();
-            waveformContainer.style.display = 'block';
-            createWaveformBars();
-            drawWaveform();
-            
-            recordBtn.disabled = true;
-            stopBtn.disabled = false;
-            updateButtonStyles();
-            
-        }} catch (err) {{
-            console.error('Error accessing microphone:', err);
-            statusDisplay.innerHTML = "❌ Error: " + err.name + ". " + err.message + ". Please ensure microphone access is granted and a microphone is connected.";
-            showWebhookStatus("❌ Microphone access denied or not found", false);
-        }}
-    }};
-
-    stopBtn.onclick = () => {{
-        console.log('Stopping recording...');
-        if (mediaRecorder && isRecording) {{
-            mediaRecorder.stop();
-            stopTimer();
-            isRecording = false;
-            recordBtn.disabled = false;
-            stopBtn.disabled = true;
-            updateButtonStyles();
-            cancelAnimationFrame(animationId);
-        }}
-    }};
-
-    function formatFileSize(bytes) {{
-        if (bytes === 0) return '0 B';
-        const k = 1024;
-        const sizes = ['B', 'KB', 'MB', 'GB'];
-        const i = Math.floor(Math.log(bytes) / Math.log(k));
-        return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
-    }}
+    def _send_metrics(self):
+        body = self.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-    // Initialize
-    updateButtonStyles();
-    console.log('Enhanced voice recorder initialized');
-    console.log('Webhook URL:', '{webhook_url}');
-    console.log('Auto-send enabled:', {str(auto_send).lower()});
-    </script>
-
-    <style>
-    #voice-recorder-enhanced button:hover:not(:disabled) {{
-        transform: scale(1.05) !important;
-        transition: all 0.2s ease;
-    }}
-    
-    #voice-recorder-enhanced button:active:not(:disabled) {{
-        transform: scale(0.98) !important;
-    }}
-    
-    @keyframes pulse {{
-        0% {{ opacity: 1; }}
-        50% {{ opacity: 0.7; }}
-        100% {{ opacity: 1; }}
-    }}
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/metrics' and self.metrics is not None:
+            return self._send_metrics()
+        route = self._route()
+        try:
+            if route is None or len(route) != 2:
+                return self._send_json(404, {'error': 'Not found'})
+            self._send_json(200, {'acked': self.ingest.acked(*route)})
+        except KeyError:
+            self._send_json(404, {'error': 'Unknown upload'})
+
+    def do_PUT(self):
+        route = self._route()
+        try:
+            if route is None or len(route) != 3:
+                return self._send_json(404, {'error': 'Not found'})
+            ticket, recording_id, seq = route
+            data = self._read_body(INGEST_MAX_SEGMENT_BYTES)
+            self._send_json(200, {'acked': self.ingest.store_segment(ticket, recording_id, int(seq), data)})
+        except KeyError:
+            self._send_json(404, {'error': 'Unknown upload'})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+
+    def do_POST(self):
+        route = self._route()
+        try:
+            if route is None or len(route) != 3 or route[2] != 'complete':
+                return self._send_json(404, {'error': 'Not found'})
+            ticket, recording_id, _ = route
+            request = json.loads(self._read_body(1024 * 1024) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object")
+            job_id, size = self.ingest.complete(
+                ticket, recording_id, request.get('segments'), request.get('payload', {})
+            )
+            self._send_json(202, {'job_id': job_id, 'bytes': size, 'queued': job_id is not None})
+        except KeyError:
+            self._send_json(404, {'error': 'Unknown upload'})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+
+@st.cache_resource(show_spinner=False)
+def get_recording_ingest():
+    """Start the chunked upload endpoint once per process, or None when unavailable"""
+    if not INGEST_ENABLED:
+        return None
+    ingest = RecordingIngest(get_webhook_dispatcher(), get_webhook_outbox())
+    app_port = st.get_option("server.port")
+    allowed_origins = INGEST_ALLOWED_ORIGINS or [f"http://localhost:{app_port}", f"http://127.0.0.1:{app_port}"]
+    handler = type('BoundIngestRequestHandler', (IngestRequestHandler,),
+                   {'ingest': ingest, 'metrics': get_webhook_metrics(), 'allowed_origins': frozenset(allowed_origins)})
+    try:
+        server = ThreadingHTTPServer((INGEST_HOST, INGEST_PORT), handler)
+    except OSError as e:
+        logger.warning("Chunked upload endpoint disabled, could not bind port %s: %s", INGEST_PORT, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="recording-ingest", daemon=True).start()
+    ingest.server = server
+    return ingest
+
+def get_ingest_upload_url():
+    """Chunked upload URL for this session's recorder, or '' to use direct sends"""
+    ingest = get_recording_ingest()
+    if ingest is None or not st.session_state.auto_send:
+        return ''
+    st.session_state.ingest_ticket = ingest.register(
+        st.session_state.get('ingest_ticket'),
+        url=st.session_state.webhook_url,
+        extra_urls=get_fanout_urls(),
+        owner=st.session_state.outbox_owner,
+        transport=st.session_state.upload_transport,
+        max_attempts=st.session_state.max_attempts
+    )
+    return ingest.upload_url(st.session_state.ingest_ticket)
+
+def awaiting_deliveries():
+    """Pick up jobs queued by chunked uploads; True while this session has something to wait for"""
+    ingest = get_recording_ingest()
+    ticket = st.session_state.get('ingest_ticket')
+    if ingest is None or not ticket:
+        return bool(st.session_state.pending_jobs)
+    st.session_state.pending_jobs.extend(ingest.take_jobs(ticket))
+    return bool(st.session_state.pending_jobs) or ingest.receiving(ticket)
+
+def render_delivery_queue():
+    """Show this session's background deliveries, polling only while there is something to wait for"""
+    # Idle sessions get no fragment at all, so they make no periodic round-trips
+    if awaiting_deliveries():
+        poll_delivery_queue()
+
+@st.fragment(run_every=2)
+def poll_delivery_queue():
+    """Poll background deliveries for this session without rerunning the whole page"""
+    if not awaiting_deliveries():
+        # Nothing left to wait for; a full rerun drops this fragment and its timer
+        st.rerun(scope="app")
+    if not st.session_state.pending_jobs:
+        return
     
-    #waveformContainer {{
-        animation: pulse 2s infinite;
-    }}
+    finished = collect_finished_jobs()
+    for job in finished:
+        success = job.result[0]
+        st.toast(f"{'✅' if success else '❌'} {job.label}: {summarize_fan_out(job.results or [job.result])}")
+    if finished:
+        # Refresh the response history outside this fragment
+        st.rerun(scope="app")
     
-    #webhookStatus {{
-        animation: slideIn 0.3s ease-out;
-    }}
+    dispatcher = get_webhook_dispatcher()
+    st.markdown('<div class="section-card">', unsafe_allow_html=True)
+    st.subheader("📬 Delivery Queue")
+    for job_id in st.session_state.pending_jobs:
+        job = dispatcher.get(job_id)
+        if job is None:
+            continue
+        if job.status == 'preparing':
+            st.write(f"🗜️ {job.label} — transcoding ({time.time() - job.started_at:.0f}s)")
+        elif job.status == 'sending':
+            st.write(f"📤 {job.label} — sending ({time.time() - job.started_at:.0f}s)")
+        else:
+            st.write(f"⏳ {job.label} — queued ({time.time() - job.submitted_at:.0f}s)")
+    st.caption(f"{dispatcher.queued()} jobs waiting across all users • {dispatcher.workers} workers")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_upload_batch():
+    """This session's batch upload, polled only while files are still being sent"""
+    if st.session_state.upload_batch.progress()['done']:
+        show_upload_batch(st.session_state.upload_batch)
+    else:
+        poll_upload_batch()
+
+@st.fragment(run_every=1)
+def poll_upload_batch():
+    """Refresh the batch upload every second without rerunning the whole page"""
+    batch = st.session_state.upload_batch
+    if batch.progress()['done']:
+        # One full rerun records the last results in the history and stops the polling
+        st.rerun(scope="app")
+    show_upload_batch(batch)
+
+def show_upload_batch(batch):
+    """Per-file progress, throughput and failures of a batch upload"""
+    for item in batch.take_finished():
+        for result in item.results:
+            record_webhook_response(result[2])
+    progress = batch.progress()
     
-    @keyframes slideIn {{
-        from {{ 
-            opacity: 0; 
-            transform: translateY(-10px); 
-        }}
-        to {{ 
-            opacity: 1; 
-            transform: translateY(0); 
-        }}
-    }}
-    </style>
-    """
-    return recorder_html
-
-def create_pdf(content, metadata):
-    """Create PDF with enhanced formatting"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
-                           leftMargin=1*inch, rightMargin=1*inch,
-                          topMargin=1*inch, bottomMargin=1*inch)
-    
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Title'],
-        fontSize=24,
-        textColor=colors.black,
-        spaceAfter=30,
-        alignment=TA_CENTER
+    st.markdown('<div class="section-card">', unsafe_allow_html=True)
+    st.subheader(f"📦 Batch Upload — {progress['sent']}/{progress['total']} files sent")
+    st.progress(
+        progress['bytes_sent'] / progress['bytes_total'] if progress['bytes_total'] else 0.0,
+        text=(f"{format_file_size(progress['bytes_sent'])} of {format_file_size(progress['bytes_total'])} • "
+              f"{format_file_size(progress['throughput'])}/s over {progress['elapsed']:.0f}s")
     )
+    icons = {'waiting': '⏳', 'queued': '⏳', 'preparing': '🗜️', 'sending': '📤', 'sent': '✅', 'failed': '❌',
+             'outbox': '📮'}
+    rows = []
+    for item in batch.items:
+        status = batch.item_status(item)
+        if item.result is not None:
+            detail = summarize_fan_out(item.results)
+        elif status == 'outbox':
+            detail = "Left to the outbox replay"
+        elif item.started_at is not None and status != 'waiting':
+            detail = f"{time.time() - item.started_at:.0f}s"
+        else:
+            detail = ""
+        rows.append({'File': f"{icons.get(status, '')} {item.label}", 'Size': format_file_size(item.size),
+                     'Status': status, 'Detail': detail})
+    st.table(rows)
     
-    story = []
-    
-    # Title page
-    if metadata.get('title'):
-        story.append(Paragraph(metadata['title'], title_style))
+    if progress['done']:
+        if progress['failed']:
+            st.warning(f"⚠️ {progress['sent']} sent, {progress['failed']} failed. Failed files stay in the "
+                       f"outbox and are retried automatically, or resume them now.")
+        elif progress['outbox']:
+            st.info(f"📮 {progress['sent']} sent, {progress['outbox']} left to the outbox replay")
+        else:
+            st.success(f"✅ All {progress['total']} files sent")
+        col1, col2 = st.columns(2)
+        with col1:
+            if progress['failed'] and st.button(f"🔁 Resume {progress['failed']} Failed", use_container_width=True):
+                resumed = batch.resume_failed()
+                if resumed < progress['failed']:
+                    st.toast(f"📮 {progress['failed'] - resumed} already picked up by the outbox replay")
+                st.rerun(scope="app")  # resumed files need the polling panel again
+        with col2:
+            if st.button("✖️ Dismiss Batch", use_container_width=True):
+                st.session_state.upload_batch = None
+                st.rerun(scope="app")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_outbox(outbox):
+    """Show payloads waiting in the durable outbox"""
+    owner = st.session_state.outbox_owner
+    entries = outbox.entries(owner=owner)
+    with st.expander(f"📮 Outbox — {outbox.count(owner)} undelivered", expanded=False):
+        st.caption(f"Replayed one at a time every {OUTBOX_REPLAY_INTERVAL:g}s with per-entry backoff • "
+                   f"{outbox.replayer.replayed} delivered by replay since the server started, across all sessions")
+        for entry in entries:
+            size = (entry['audio_size'] or 0) + entry['payload_size']
+            retry_in = max(0, entry['next_attempt_at'] - time.time())
+            status = {'inflight': "sending", 'dead': "rejected, not retried"}.get(
+                entry['state'], f"next try in {retry_in:.0f}s")
+            st.write(
+                f"• {datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d %H:%M:%S')} — "
+                f"{format_file_size(size)}, {entry['attempts']} failed attempts, {status}"
+            )
+            if entry['last_error']:
+                st.caption(f"Last error: {entry['last_error']}")
+        if st.button("🗑️ Discard Undelivered Payloads"):
+            outbox.discard(owner=owner)
+            st.rerun()
+
+@st.fragment(run_every=1)
+def render_export_progress(kind):
+    """Progress and cancel control for a background render, polled until it finishes"""
+    pool = get_render_pool()
+    job_id = st.session_state.render_jobs[kind]
+    job = pool.get(job_id)
+    if job is None or job.finished:
+        del st.session_state.render_jobs[kind]
+        if job is not None:
+            pool.pop(job_id)
+            if job.status == 'done':
+                st.session_state.exports[kind] = dict(job.result, file_name=job.label + EXPORT_FORMATS[kind][0],
+                                                      cached=False)
+            elif job.status == 'failed':
+                st.session_state.export_errors[kind] = job.error
+        st.rerun(scope="app")
     
-    if metadata.get('author'):
-        author_style = ParagraphStyle('Author', parent=styles['Normal'], 
-                                    fontSize=14, alignment=TA_CENTER, spaceAfter=20)
-        story.append(Paragraph(f"by {metadata['author']}", author_style))
+    paragraphs = job.progress.get('paragraphs', 0)
+    pages = job.progress.get('pages')
+    st.progress(min(paragraphs / job.paragraphs, 1.0) if job.paragraphs else 0.0,
+                text=f"{job.status.title()} {kind.upper()}: {paragraphs} paragraphs"
+                     + (f", {pages} pages" if pages is not None else ""))
+    if st.button("✖️ Cancel", key=f"cancel_{kind}", use_container_width=True):
+        pool.cancel(job_id)
+
+def format_latency(seconds):
+    """Latency in milliseconds below a second, otherwise seconds"""
+    return "–" if seconds is None else f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+def format_body_size(record):
+    """Body size, with the uncompressed size when it was sent compressed"""
+    if not record.payload_size:
+        return '–'
+    if record.content_encoding in (None, 'identity') or not record.uncompressed_size:
+        return format_file_size(record.payload_size)
+    return (f"{format_file_size(record.payload_size)} {record.content_encoding} "
+            f"({record.payload_size / record.uncompressed_size:.0%} of {format_file_size(record.uncompressed_size)})")
+
+def format_timings(timings):
+    """Compact per-phase breakdown such as 'serialize 2 ms · connect 11 ms · ttfb 140 ms'"""
+    if not timings:
+        return ''
+    return ' · '.join(f"{phase} {format_latency(timings[phase])}"
+                      for phase in TIMING_PHASES if phase in timings and phase != 'total')
+
+def history_row(record):
+    """One row of the delivery history table"""
+    return {
+        'Time': record.timestamp[:19].replace('T', ' '),
+        'Result': ('♻️ duplicate' if record.bytes_saved is not None
+                   else ('✅ ' if record.success else '❌ ') + str(record.status_code or 'error')),
+        'Latency': format_latency(record.elapsed),
+        'Breakdown': format_timings(record.timings),
+        'Size': format_body_size(record),
+        # Duplicates and circuit-open skips made 0 attempts; browser sends make one and do not report it
+        'Attempts': 1 if record.attempts is None else record.attempts,
+        'Via': record.source or record.transport or 'json',
+        'Detail': record.error or record.response_text or ''
+    }
+
+def render_history(history, limit=20):
+    """Aggregate delivery metrics and a compact table of the latest deliveries"""
+    summary = history.summary()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📨 Deliveries", summary['count'])
+    with col2:
+        st.metric("✅ Success Rate", f"{summary['success_rate']:.0%}")
+    with col3:
+        st.metric("⏱️ Latency p50 / p95", f"{format_latency(summary['p50'])} / {format_latency(summary['p95'])}",
+                  help=f"p99: {format_latency(summary['p99'])}")
+    with col4:
+        st.metric("📦 Bytes Sent", format_file_size(summary['bytes_sent']),
+                  help=f"{summary['duplicates']} duplicate sends skipped, "
+                       f"{format_file_size(summary['bytes_saved'])} not sent again")
     
-    story.append(Spacer(1, 50))
+    st.dataframe(
+        [history_row(record) for record in history.recent(limit)],
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"Showing the latest {min(limit, len(history))} of {len(history)} kept deliveries"
+               + (" from all sessions" if WEBHOOK_HISTORY_SHARED else ""))
+
+def render_export(kind, label):
+    """Generate button, download button and summary for one export format"""
+    name = kind.upper()
+    rendering = kind in st.session_state.render_jobs
+    if st.button(label, use_container_width=True, key=f"generate_{kind}", disabled=rendering):
+        if st.session_state.content or st.session_state.recording_description:
+            content = st.session_state.content or st.session_state.recording_description
+            metadata = {
+                'title': st.session_state.recording_title or 'Book Buddy Recording',
+                'author': st.session_state.user_name
+            }
+            st.session_state.export_errors.pop(kind, None)
+            try:
+                export, job_id = start_export(kind, content, metadata, {'layout': st.session_state.book_layout})
+            except Exception as e:
+                st.error(f"❌ Error generating {name}: {str(e)}")
+            else:
+                if export is not None:
+                    st.session_state.exports[kind] = dict(export, file_name=metadata['title'] + EXPORT_FORMATS[kind][0])
+                    st.success(f"✅ {name} ready (from cache)!")
+                else:
+                    st.session_state.render_jobs[kind] = job_id
+                    rendering = True
+        else:
+            st.warning("⚠️ Please add some content first")
     
-    # Content
-    if content:
-        body_style = ParagraphStyle('Body', parent=styles['Normal'], 
-                                  fontSize=12, alignment=TA_JUSTIFY, spaceAfter=12)
-        paragraphs = content.split('\n\n')
-        for para in paragraphs:
-            if para.strip():
-                story.append(Paragraph(para.strip(), body_style))
-                story.append(Spacer(1, 12))
+    if rendering:
+        render_export_progress(kind)
+    if kind in st.session_state.export_errors:
+        st.error(f"❌ Error generating {name}: {st.session_state.export_errors[kind]}")
     
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    export = st.session_state.exports.get(kind)
+    if export and os.path.exists(export['path']):
+        # Read from disk only when clicked, instead of holding the file in session memory
+        st.download_button(
+            label=f"⬇️ Download {name}",
+            data=functools.partial(read_export, export['path']),
+            file_name=export['file_name'],
+            mime=EXPORT_FORMATS[kind][1],
+            use_container_width=True,
+            key=f"download_{kind}"
+        )
+        st.caption(describe_export(export['stats'], export['cached']))
 
 # Main application
 def main():
@@ -769,6 +3235,11 @@ def main():
     
     # Webhook Status Bar
     webhook_status = "🟢 Connected" if validate_webhook_url(st.session_state.webhook_url) else "🔴 Invalid URL"
+    breaker = get_circuit_breakers().get(st.session_state.webhook_url)
+    if breaker.state == CircuitBreaker.OPEN:
+        webhook_status = f"🟠 Unhealthy, circuit open (retry in {breaker.retry_in():.0f}s)"
+    elif breaker.state == CircuitBreaker.HALF_OPEN:
+        webhook_status = "🟡 Recovering, probing endpoint"
     st.markdown(f"""
     <div class="status-info">
         <strong>🎯 Webhook Status:</strong> {webhook_status} | 
@@ -791,13 +3262,73 @@ def main():
             if new_webhook_url != st.session_state.webhook_url:
                 st.session_state.webhook_url = new_webhook_url
                 st.rerun()
-            
+
+            fanout_text = st.text_area(
+                "🔀 Additional Endpoints",
+                value="\n".join(st.session_state.fanout_urls),
+                help="One URL per line. Recordings, uploads and texts are sent to all endpoints concurrently; "
+                     "a failed endpoint is retried on its own"
+            )
+            st.session_state.fanout_urls = [line.strip() for line in fanout_text.splitlines() if line.strip()]
+            invalid_urls = [url for url in st.session_state.fanout_urls if not validate_webhook_url(url)]
+            if invalid_urls:
+                st.warning(f"Ignoring invalid URL(s): {', '.join(invalid_urls)}")
+
             st.session_state.auto_send = st.checkbox(
                 "🔄 Auto-send recordings", 
                 value=st.session_state.auto_send,
                 help="Automatically send recordings to webhook after stopping"
             )
             
+            st.session_state.max_attempts = st.number_input(
+                "🔁 Max Delivery Attempts",
+                min_value=1,
+                max_value=10,
+                value=int(st.session_state.max_attempts),
+                help="Retries 5xx/429 responses, timeouts and connection errors with jittered exponential backoff"
+            )
+            
+            transport_keys = list(UPLOAD_TRANSPORTS)
+            st.session_state.upload_transport = st.selectbox(
+                "📦 File Upload Transport",
+                transport_keys,
+                index=transport_keys.index(st.session_state.upload_transport),
+                format_func=UPLOAD_TRANSPORTS.get,
+                help="Multipart and raw binary stream the file in chunks instead of base64-encoding it into JSON"
+            )
+            
+            encoding_keys = ['identity'] + list(REQUEST_CODECS)
+            st.session_state.request_encoding = st.selectbox(
+                "🗜️ Request Compression",
+                encoding_keys,
+                index=encoding_keys.index(st.session_state.request_encoding),
+                format_func=lambda key: "Off" if key == 'identity' else key,
+                help=f"Compress JSON bodies of {format_file_size(REQUEST_COMPRESSION_THRESHOLD)} or more "
+                     "(Send Text, JSON file uploads). Endpoints that reject compressed bodies are sent plain ones."
+            )
+            if st.session_state.request_encoding != 'identity':
+                max_level = 19 if st.session_state.request_encoding == 'zstd' else 9
+                st.session_state.compression_level = st.slider(
+                    "Compression Level",
+                    min_value=1,
+                    max_value=max_level,
+                    value=min(int(st.session_state.compression_level), max_level),
+                    help="Higher levels send fewer bytes but take longer to compress"
+                )
+            
+            st.session_state.skip_duplicates = st.checkbox(
+                "♻️ Skip duplicate audio",
+                value=st.session_state.skip_duplicates,
+                disabled=DEDUP_TTL <= 0,
+                help=f"Audio already delivered to this URL in the last {DEDUP_TTL // 60} min "
+                     "(same SHA-256 and same title, description and other details) is not sent again"
+            )
+            st.session_state.idempotency_keys = st.checkbox(
+                "🔑 Send Idempotency-Key header",
+                value=st.session_state.idempotency_keys,
+                help="Audio sends carry the SHA-256 of the URL, audio and details, so the receiver can drop repeats too"
+            )
+            
             if st.button("🧪 Test Webhook Connection"):
                 with st.spinner("Testing webhook..."):
                     test_payload = {
@@ -805,12 +3336,34 @@ def main():
                         "message": "Test from Book Buddy Enhanced",
                         "timestamp": datetime.now().isoformat()
                     }
-                    success, message, response_data = send_to_webhook(test_payload)
+                    # A connectivity test should report the first failure, not retry it
+                    success, message, response_data = send_to_webhook(
+                        test_payload, retry_policy=RetryPolicy(max_attempts=1),
+                        compression=get_compression_policy()
+                    )
                     if success:
                         st.success(f"✅ {message}")
                     else:
                         st.error(f"❌ {message}")
-        
+
+            pool = get_webhook_session_pool()
+            pool_stats = pool.stats.snapshot()
+            st.caption(
+                f"🔌 Connection pool: {pool.pool_maxsize} per host "
+                f"({'blocking' if pool.pool_block else 'non-blocking'}), "
+                f"{pool_stats['requests']} requests, {pool_stats['new_connections']} new connections, "
+                f"{pool_stats['reused_connections']} reused ({pool_stats['reuse_ratio']:.0%})"
+            )
+            dedup_stats = get_delivery_deduplicator().stats()
+            if dedup_stats['duplicates']:
+                st.caption(f"♻️ {dedup_stats['duplicates']} duplicate sends skipped, "
+                           f"{format_file_size(dedup_stats['bytes_saved'])} saved")
+            metrics_targets = [f"{INGEST_PUBLIC_URL}/metrics"] if get_recording_ingest() is not None else []
+            if METRICS_FILE:
+                metrics_targets.append(METRICS_FILE)
+            if metrics_targets:
+                st.caption(f"📈 Delivery metrics (Prometheus): {' · '.join(metrics_targets)}")
+
         with col2:
             st.subheader("🎙️ Recording Settings")
             st.session_state.user_name = st.text_input(
@@ -828,9 +3381,43 @@ def main():
             
             st.session_state.audio_quality = st.selectbox(
                 "Audio Quality", 
-                ["High", "Medium", "Low"], 
-                index=["High", "Medium", "Low"].index(st.session_state.audio_quality)
+                AUDIO_QUALITY_OPTIONS, 
+                index=AUDIO_QUALITY_OPTIONS.index(st.session_state.audio_quality),
+                help="Bitrate, channels and sample rate used by the recorder and by upload transcoding"
+            )
+            if st.session_state.audio_quality == 'Custom':
+                qcol1, qcol2, qcol3 = st.columns(3)
+                with qcol1:
+                    st.session_state.custom_bitrate_kbps = st.number_input(
+                        "Bitrate (kbps)", min_value=6, max_value=256,
+                        value=int(st.session_state.custom_bitrate_kbps)
+                    )
+                with qcol2:
+                    st.session_state.custom_channels = st.selectbox(
+                        "Channels", [1, 2], index=[1, 2].index(st.session_state.custom_channels),
+                        format_func=lambda n: "Mono" if n == 1 else "Stereo"
+                    )
+                with qcol3:
+                    st.session_state.custom_sample_rate = st.selectbox(
+                        "Sample Rate", OPUS_SAMPLE_RATES,
+                        index=OPUS_SAMPLE_RATES.index(st.session_state.custom_sample_rate),
+                        format_func=lambda rate: f"{rate / 1000:g} kHz"
+                    )
+            audio_profile = get_audio_profile()
+            st.caption(f"🎚️ {describe_audio_profile(audio_profile)}")
+            
+            transcoder = get_audio_transcoder()
+            transcode_keys = list(TRANSCODE_MODES)
+            st.session_state.transcode_mode = st.selectbox(
+                "🗜️ Transcode Uploads",
+                transcode_keys,
+                index=transcode_keys.index(st.session_state.transcode_mode),
+                format_func=TRANSCODE_MODES.get,
+                disabled=not transcoder.available,
+                help=f"Re-encode uploaded files to Opus/WebM at {describe_audio_profile(audio_profile)} before sending"
             )
+            if not transcoder.available:
+                st.caption("ffmpeg was not found on this server, so uploads are sent as-is")
     
     # Recording Metadata Section
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
@@ -855,7 +3442,7 @@ def main():
     
     # Enhanced Voice Recorder Section
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
-    recorder_component = components.html(create_enhanced_voice_recorder(), height=600)
+    handle_recorder_report(render_voice_recorder())
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Manual Actions Section
@@ -867,90 +3454,68 @@ def main():
     with col1:
         if st.button("📤 Send Text to Webhook", use_container_width=True):
             if st.session_state.recording_title or st.session_state.recording_description:
-                with st.spinner("Sending text data..."):
-                    payload = {
-                        "title": st.session_state.recording_title,
-                        "description": st.session_state.recording_description,
-                        "user_name": st.session_state.user_name,
-                        "book_type": st.session_state.book_type,
-                        "source": "manual_text",
-                        "content": st.session_state.content
-                    }
-                    success, message, response_data = send_to_webhook(payload)
-                    if success:
-                        st.success(f"✅ {message}")
-                    else:
-                        st.error(f"❌ {message}")
+                payload = {
+                    "title": st.session_state.recording_title,
+                    "description": st.session_state.recording_description,
+                    "user_name": st.session_state.user_name,
+                    "book_type": st.session_state.book_type,
+                    "source": "manual_text",
+                    "content": st.session_state.content
+                }
+                if queue_webhook(payload, label="Text"):
+                    st.info("📬 Text queued for delivery")
             else:
                 st.warning("⚠️ Please enter a title or description")
     
     with col2:
-        uploaded_file = st.file_uploader("📁 Upload Audio", type=['mp3', 'wav', 'ogg', 'webm', 'm4a'])
-        if uploaded_file and st.button("📤 Send File", use_container_width=True):
-            with st.spinner("Processing and sending file..."):
-                try:
-                    audio_bytes = uploaded_file.read()
-                    audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-                    
-                    payload = {
-                        "title": st.session_state.recording_title or uploaded_file.name,
-                        "description": st.session_state.recording_description,
-                        "user_name": st.session_state.user_name,
-                        "book_type": st.session_state.book_type,
-                        "audio_data": audio_base64,
-                        "audio_format": uploaded_file.type,
-                        "filename": uploaded_file.name,
-                        "file_size": len(audio_bytes),
-                        "source": "file_upload"
-                    }
-                    
-                    success, message, response_data = send_to_webhook(payload)
-                    if success:
-                        st.success(f"✅ {message}")
-                    else:
-                        st.error(f"❌ {message}")
-                except Exception as e:
-                    st.error(f"❌ Error processing file: {str(e)}")
+        uploaded_files = st.file_uploader("📁 Upload Audio", type=['mp3', 'wav', 'ogg', 'webm', 'm4a'],
+                                          accept_multiple_files=True)
+        batch = st.session_state.upload_batch
+        if len(uploaded_files) == 1 and st.button("📤 Send File", use_container_width=True):
+            uploaded_file = uploaded_files[0]
+            transcode_stage = make_transcode_stage(get_audio_profile(), st.session_state.transcode_mode)
+            if queue_webhook(upload_payload(uploaded_file), audio_file=uploaded_file,
+                             transport=st.session_state.upload_transport, label=uploaded_file.name,
+                             prepare=transcode_stage):
+                st.info(f"📬 {uploaded_file.name} queued for delivery")
+        elif len(uploaded_files) > 1 and st.button(f"📤 Send {len(uploaded_files)} Files", use_container_width=True,
+                                                   disabled=batch is not None and not batch.progress()['done']):
+            start_upload_batch(uploaded_files)
+            st.info(f"📬 {len(uploaded_files)} files queued, {BATCH_UPLOAD_CONCURRENCY} at a time")
     
     with col3:
-        if st.button("📄 Generate PDF", use_container_width=True):
-            if st.session_state.content or st.session_state.recording_description:
-                with st.spinner("Generating PDF..."):
-                    try:
-                        content = st.session_state.content or st.session_state.recording_description
-                        metadata = {
-                            'title': st.session_state.recording_title or 'Book Buddy Recording',
-                            'author': st.session_state.user_name
-                        }
-                        pdf_buffer = create_pdf(content, metadata)
-                        
-                        st.download_button(
-                            label="⬇️ Download PDF",
-                            data=pdf_buffer.getvalue(),
-                            file_name=f"{metadata['title']}.pdf",
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-                        st.success("✅ PDF generated successfully!")
-                    except Exception as e:
-                        st.error(f"❌ Error generating PDF: {str(e)}")
-            else:
-                st.warning("⚠️ Please add some content first")
+        layouts = load_exporters().LAYOUTS
+        st.selectbox("📐 Book Layout", options=list(layouts), key='book_layout',
+                     format_func=lambda name: layouts[name].label,
+                     help="Page size and type for exports; EPUB uses the type size only")
+        for kind, label in (('pdf', "📄 Generate PDF"), ('epub', "📚 Generate EPUB")):
+            render_export(kind, label)
+        cache_stats = get_artifact_cache().stats()
+        if cache_stats['hits'] or cache_stats['misses']:
+            st.caption(f"🗃️ Export cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses • "
+                       f"{cache_stats['files']} files, {format_file_size(cache_stats['bytes'])}")
     
     with col4:
         if st.button("🗑️ Clear All Data", use_container_width=True):
             # Reset session state
-            for key in ['recording_title', 'recording_description', 'content', 'webhook_responses']:
+            for key in ['recording_title', 'recording_description', 'content']:
                 if key in st.session_state:
-                    if key == 'webhook_responses':
-                        st.session_state[key] = []
-                    else:
-                        st.session_state[key] = ''
+                    st.session_state[key] = ''
+            if not WEBHOOK_HISTORY_SHARED:
+                st.session_state.webhook_history.clear()
             st.success("✅ All data cleared!")
             st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    render_delivery_queue()
+    if st.session_state.upload_batch is not None:
+        render_upload_batch()
+    
+    outbox = get_webhook_outbox()
+    if outbox.count(st.session_state.outbox_owner):
+        render_outbox(outbox)
+    
     # Content Section
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
     st.subheader("📝 Additional Content")
@@ -962,37 +3527,35 @@ def main():
     )
     
     if st.session_state.content:
+        stats = get_content_stats(st.session_state.content)
         col1, col2, col3 = st.columns(3)
         with col1:
-            word_count = len(st.session_state.content.split())
-            st.metric("📊 Words", word_count)
+            st.metric("📊 Words", stats['words'])
+            st.metric("¶ Paragraphs", stats['paragraphs'])
         with col2:
-            char_count = len(st.session_state.content)
-            st.metric("🔤 Characters", char_count)
+            st.metric("🔤 Characters", stats['characters'])
+            st.metric("💬 Sentences", stats['sentences'])
         with col3:
-            estimated_pages = max(1, word_count // 250)
-            st.metric("📄 Est. Pages", estimated_pages)
+            st.metric("📄 Est. Pages", stats['pages'])
+            st.metric("⏱️ Reading Time", format_reading_time(stats['reading_minutes']))
+        
+        if len(stats['chapters']) > 1:
+            words_per_minute = load_exporters().READING_WORDS_PER_MINUTE
+            with st.expander(f"📚 Chapters ({len(stats['chapters'])})"):
+                st.table([
+                    {'Chapter': chapter['title'], 'Words': chapter['words'],
+                     'Reading Time': format_reading_time(chapter['words'] / words_per_minute)}
+                    for chapter in stats['chapters']
+                ])
     
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Webhook Response History
-    if st.session_state.webhook_responses:
+    history = get_webhook_history()
+    if len(history):
         st.markdown('<div class="section-card">', unsafe_allow_html=True)
         st.subheader("📊 Webhook Response History")
-        
-        for i, response in enumerate(st.session_state.webhook_responses[:5]):
-            with st.expander(f"Response {i+1} - {response.get('timestamp', 'Unknown time')[:19]}", expanded=i==0):
-                if response.get('success'):
-                    st.success(f"✅ Status: {response.get('status_code', 'Unknown')}")
-                    if 'payload_size' in response:
-                        st.info(f"📦 Payload size: {format_file_size(response['payload_size'])}")
-                    if response.get('response_text'):
-                        st.code(response['response_text'][:200] + "..." if len(response['response_text']) > 200 else response['response_text'])
-                else:
-                    st.error(f"❌ Error: {response.get('error', 'Unknown error')}")
-                    if 'status_code' in response:
-                        st.error(f"Status Code: {response['status_code']}")
-        
+        render_history(history)
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Footer
@@ -0,0 +1,86 @@
+"""Throughput of the markdown export pipeline on a generated manuscript.
+
+Run from the repository root:
+
+    python benchmarks/markdown_parse.py --words 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exporters  # noqa: E402
+
+WORDS = ("the a reader story river night <quiet> & voice page ink letter morning "
+         "house road memory light window garden winter year").split()
+
+def make_manuscript(words, seed=7):
+    """Markdown with chapters, emphasis, lists, quotes and raw ``<``/``&``"""
+    rng = random.Random(seed)
+    parts = []
+    written = 0
+    chapter = 0
+    while written < words:
+        if written // 5000 >= chapter:
+            chapter += 1
+            parts.append(f"# Chapter {chapter}")
+        size = rng.randint(40, 160)
+        sentence = [rng.choice(WORDS) for _ in range(size)]
+        sentence[3] = f"*{sentence[3]}*"
+        sentence[7] = f"**{sentence[7]}**"
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append("\n".join(f"- {' '.join(sentence[i:i + 8])}" for i in range(0, 32, 8)))
+        elif roll < 0.08:
+            parts.append("> " + " ".join(sentence))
+        else:
+            parts.append(" ".join(sentence))
+        written += size
+    return "\n\n".join(parts)
+
+def timed(label, words, func):
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    print(f"{label:<28} {seconds * 1000:9.1f} ms  {words / seconds / 1000:9.1f}k words/s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=100000)
+    parser.add_argument("--no-render", action="store_true", help="only benchmark parsing")
+    args = parser.parse_args()
+
+    content = make_manuscript(args.words)
+    print(f"{args.words} words, {len(content) / 1e6:.2f} MB, "
+          f"{sum(1 for _ in exporters.iter_markdown_chunks(content))} paragraphs")
+
+    exporters.parse_chunk.cache_clear()
+    exporters.parse_manuscript.cache_clear()
+    blocks = timed("parse (cold)", args.words, lambda: exporters.parse_manuscript(content))
+    timed("parse (memoized)", args.words, lambda: exporters.parse_manuscript(content))
+
+    # Editing one paragraph re-parses only that paragraph
+    middle = len(content) // 2
+    edited = content[:middle] + " edited" + content[middle:]
+    timed("parse after one edit", args.words, lambda: exporters.parse_manuscript(edited))
+    print(f"{len(blocks)} blocks, paragraph cache {exporters.parse_chunk.cache_info()}")
+
+    if args.no_render:
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        _, stats = timed("PDF render", args.words,
+                         lambda: exporters.create_pdf(content, {'title': 'Benchmark'},
+                                                      output=os.path.join(directory, "bench.pdf")))
+        print(f"  {stats['pages']} pages, {stats['pages_per_second']:.1f} pages/s, {stats['bytes'] / 1e6:.2f} MB")
+        _, stats = timed("EPUB render", args.words,
+                         lambda: exporters.create_epub(content, {'title': 'Benchmark'},
+                                                       output=os.path.join(directory, "bench.epub")))
+        print(f"  {stats['chapters']} chapters, {stats['bytes'] / 1e6:.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Encode time and peak memory for audio webhook bodies at 1/10/100 MB.
+
+Compares the old path (base64 string inside the payload, stdlib
+``json.dumps`` then UTF-8 encode, as ``requests(json=...)`` did) with the
+serializers in app.py, and the optional request compression codecs.
+Run from the repository root:
+
+    python benchmarks/serialize_payload.py --sizes 1 10 100
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+PAYLOAD = {
+    'title': 'Benchmark recording',
+    'description': 'Serialization benchmark',
+    'user_name': 'bench',
+    'book_type': 'Fiction',
+    'filename': 'recording.webm',
+    'audio_format': 'audio/webm',
+    'source': 'benchmark'
+}
+
+def legacy_body(audio):
+    payload = dict(PAYLOAD, audio_data=base64.b64encode(audio).decode('utf-8'))
+    return json.dumps(payload).encode('utf-8')
+
+def app_body(serializer, compression=None):
+    def build(audio):
+        configured, app.JSON_SERIALIZER = app.JSON_SERIALIZER, serializer
+        try:
+            _, _, size, _ = app.build_request_body(dict(PAYLOAD), io.BytesIO(audio), 'json', compression=compression)
+        finally:
+            app.JSON_SERIALIZER = configured
+        return size
+    return build
+
+def measure(build, audio):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build(audio)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = result if isinstance(result, int) else len(result)
+    return seconds, peak, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="audio sizes in MB")
+    args = parser.parse_args()
+
+    cases = [('legacy json.dumps', legacy_body), ('app + json', app_body('json'))]
+    if 'orjson' in app.JSON_SERIALIZERS:
+        cases.append(('app + orjson', app_body('orjson')))
+    for encoding in app.REQUEST_CODECS:
+        cases.append((f'app + {encoding} (level 6)', app_body(app.JSON_SERIALIZER, app.CompressionPolicy(encoding, 6))))
+
+    # Recorded audio is already compressed, so random bytes are a fair stand-in
+    print(f"{'case':<26} {'MB':>5} {'time ms':>10} {'peak MB':>9} {'body MB':>9}")
+    for megabytes in args.sizes:
+        audio = os.urandom(megabytes * 1024 * 1024)
+        for label, build in cases:
+            seconds, peak, size = measure(build, audio)
+            print(f"{label:<26} {megabytes:>5} {seconds * 1000:>10.1f} {peak / 1e6:>9.1f} {size / 1e6:>9.2f}")
+        print()
+
+if __name__ == "__main__":
+    main()
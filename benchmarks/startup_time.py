@@ -0,0 +1,94 @@
+"""Cold-start import time and per-rerun overhead of app.py.
+
+Imports the app in a fresh interpreter under ``python -X importtime`` and
+checks that the export (ReportLab, ebooklib, markdown-it) and HTTP
+(requests, urllib3) stacks stay deferred until first use, then times
+script reruns with Streamlit's AppTest. Exits non-zero when a deferred
+module is imported at startup or a budget is exceeded, so it can guard
+CI. Run from the repository root:
+
+    python benchmarks/startup_time.py --max-cold-ms 250 --max-rerun-ms 150
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED_MODULES = ('exporters', 'reportlab', 'ebooklib', 'markdown_it', 'requests', 'urllib3')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def import_times():
+    """(self, cumulative) import time in ms per module for ``import app`` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    own, cumulative = {}, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            module = match.group(4)
+            own[module] = int(match.group(1)) / 1000
+            cumulative[module] = int(match.group(2)) / 1000
+    return own, cumulative
+
+def package_time(own, package):
+    """Time spent importing ``package`` and its submodules"""
+    return sum(ms for module, ms in own.items() if module == package or module.startswith(package + '.'))
+
+def rerun_times(runs):
+    """Wall time in ms of the first script run and of each following rerun"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=60)
+    timings = []
+    for _ in range(runs + 1):
+        started = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - started) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return timings[0], timings[1:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="reruns to time")
+    parser.add_argument("--max-cold-ms", type=float, default=None,
+                        help="budget for importing app.py on top of Streamlit itself")
+    parser.add_argument("--max-rerun-ms", type=float, default=None, help="budget for the median rerun")
+    args = parser.parse_args()
+
+    own_times, cumulative = import_times()
+    total = cumulative['app']
+    streamlit = cumulative.get('streamlit', 0.0)
+    own = total - streamlit
+    print(f"{'import app (cumulative)':<28} {total:>8.1f} ms")
+    print(f"{'  streamlit':<28} {streamlit:>8.1f} ms")
+    print(f"{'  app.py on top':<28} {own:>8.1f} ms")
+    loaded = [module for module in DEFERRED_MODULES if module in cumulative]
+    for module in DEFERRED_MODULES:
+        state = f"{package_time(own_times, module):>8.1f} ms" if module in cumulative else "deferred"
+        print(f"{'  ' + module:<28} {state:>11}")
+
+    first, reruns = rerun_times(args.runs)
+    reruns.sort()
+    median = reruns[len(reruns) // 2]
+    print(f"{'first script run':<28} {first:>8.1f} ms")
+    print(f"{'rerun (median of %d)' % len(reruns):<28} {median:>8.1f} ms")
+
+    failures = []
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    if args.max_cold_ms is not None and own > args.max_cold_ms:
+        failures.append(f"app.py import {own:.1f} ms > {args.max_cold_ms:.1f} ms")
+    if args.max_rerun_ms is not None and median > args.max_rerun_ms:
+        failures.append(f"rerun {median:.1f} ms > {args.max_rerun_ms:.1f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,620 @@
+"""Document export engine for Book Buddy.
+
+Kept free of Streamlit so that render worker processes can import it
+without re-running the app's page setup.
+"""
+import functools
+import html
+import os
+import re
+import tempfile
+import time
+import uuid
+from collections import namedtuple
+from types import SimpleNamespace
+
+PDF_LOOKAHEAD = 64  # flowables materialised ahead of the layout engine
+PDF_SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # bytes kept in memory before an in-memory PDF spills to disk
+PDF_RENDERER_VERSION = 4  # bump when PDF output changes so cached files are not reused
+EPUB_RENDERER_VERSION = 3  # bump when EPUB output changes so cached files are not reused
+MARKDOWN_CACHE_PARAGRAPHS = int(os.environ.get("BOOKBUDDY_MARKDOWN_CACHE", "16384"))  # parsed paragraphs kept
+READING_WORDS_PER_MINUTE = 230
+WORDS_PER_PAGE = 250
+EPUB_CHAPTER_WORDS = int(os.environ.get("BOOKBUDDY_EPUB_CHAPTER_WORDS", "5000"))  # split untitled text past this
+DEFAULT_LAYOUT = os.environ.get("BOOKBUDDY_BOOK_LAYOUT", "a4")
+
+# Book layouts shared by the PDF and EPUB writers. Sizes are in points
+# (1/72 inch) so the table does not need ReportLab to be imported.
+BookLayout = namedtuple('BookLayout', 'label page_size margins font_size leading title_size author_size')
+
+LAYOUTS = {
+    'trade': BookLayout("Trade paperback (6 × 9 in)", (432, 648), (54, 54, 54, 54), 11, 14.5, 22, 13),
+    'a4': BookLayout("A4", (595.2756, 841.8898), (72, 72, 72, 72), 12, 15, 24, 14),
+    'letter': BookLayout("US Letter", (612, 792), (72, 72, 72, 72), 12, 15, 24, 14),
+    'large_print': BookLayout("Large print (US Letter, 16 pt)", (612, 792), (72, 72, 72, 72), 16, 22, 30, 18)
+}
+if DEFAULT_LAYOUT not in LAYOUTS:
+    DEFAULT_LAYOUT = 'a4'
+
+# PDF export
+class LazyFlowables:
+    """List-like window over a flowable generator for ReportLab's build loop.
+
+    ``BaseDocTemplate.build`` only ever looks at the front of the story
+    (indexing, slicing, deleting and inserting near position 0), so the
+    story can be produced on demand. At most ``lookahead`` flowables are
+    materialised at once instead of the whole manuscript.
+    """
+
+    def __init__(self, iterable, lookahead=PDF_LOOKAHEAD):
+        self._source = iter(iterable)
+        self._buffer = []
+        self._lookahead = lookahead
+        self._exhausted = False
+
+    def _fill(self, size):
+        while not self._exhausted and len(self._buffer) < size:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                self._exhausted = True
+
+    def _fill_for(self, index):
+        if isinstance(index, slice):
+            if index.stop is None or index.stop < 0 or (index.start or 0) < 0:
+                raise IndexError("LazyFlowables only supports forward slices")
+            self._fill(index.stop)
+        else:
+            if index < 0:
+                raise IndexError("LazyFlowables does not support negative indexes")
+            self._fill(index + 1)
+
+    def __len__(self):
+        # Keep enough lookahead for keepWithNext chains
+        self._fill(self._lookahead)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        self._fill_for(index)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value):
+        self._fill_for(index)
+        self._buffer[index] = value
+
+    def __delitem__(self, index):
+        self._fill_for(index)
+        del self._buffer[index]
+
+    def insert(self, index, value):
+        self._fill_for(index)
+        self._buffer.insert(index, value)
+
+@functools.lru_cache(maxsize=None)
+def _reportlab():
+    """ReportLab, imported on the first PDF export rather than at startup"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted
+    from reportlab.platypus.flowables import HRFlowable
+
+    class StreamingDocTemplate(SimpleDocTemplate):
+        """SimpleDocTemplate that reports every finished page"""
+
+        def __init__(self, *args, on_page=None, **kwargs):
+            self.on_page = on_page
+            self.pages_emitted = 0
+            super().__init__(*args, **kwargs)
+
+        def afterPage(self):
+            self.pages_emitted += 1
+            if self.on_page is not None:
+                self.on_page(self.pages_emitted)
+
+    return SimpleNamespace(
+        colors=colors, TA_CENTER=TA_CENTER, TA_JUSTIFY=TA_JUSTIFY, TA_LEFT=TA_LEFT,
+        getSampleStyleSheet=getSampleStyleSheet, ParagraphStyle=ParagraphStyle,
+        Paragraph=Paragraph, Spacer=Spacer, Preformatted=Preformatted, HRFlowable=HRFlowable,
+        StreamingDocTemplate=StreamingDocTemplate
+    )
+
+# Paragraph styles for one layout: headings and lists are tuples indexed by level - 1
+PdfStyles = namedtuple('PdfStyles', 'title author body quote code headings lists')
+
+@functools.lru_cache(maxsize=None)
+def pdf_styles(layout_name):
+    """Paragraph styles for a layout, built once per process and shared by every build.
+
+    ReportLab styles are plain objects, so callers must treat them as read-only.
+    """
+    rl = _reportlab()
+    layout = LAYOUTS[layout_name]
+    sample = rl.getSampleStyleSheet()
+    scale = layout.font_size / 12
+    body = rl.ParagraphStyle('Body', parent=sample['Normal'], fontSize=layout.font_size,
+                             leading=layout.leading, alignment=rl.TA_JUSTIFY, spaceAfter=layout.font_size)
+    return PdfStyles(
+        title=rl.ParagraphStyle('CustomTitle', parent=sample['Title'], fontSize=layout.title_size,
+                                leading=layout.title_size * 1.2, textColor=rl.colors.black,
+                                spaceAfter=30, alignment=rl.TA_CENTER),
+        author=rl.ParagraphStyle('Author', parent=sample['Normal'], fontSize=layout.author_size,
+                                 leading=layout.author_size * 1.2, alignment=rl.TA_CENTER, spaceAfter=20),
+        body=body,
+        quote=rl.ParagraphStyle('Quote', parent=body, leftIndent=24, rightIndent=24,
+                                textColor=rl.colors.HexColor('#444444')),
+        code=rl.ParagraphStyle('BookCode', parent=sample['Code'], fontSize=sample['Code'].fontSize * scale,
+                               leading=sample['Code'].leading * scale),
+        headings=tuple(
+            rl.ParagraphStyle(f'BookHeading{level}', parent=sample[f'Heading{level}'],
+                              fontSize=sample[f'Heading{level}'].fontSize * scale,
+                              leading=sample[f'Heading{level}'].leading * scale)
+            for level in range(1, 7)
+        ),
+        lists=tuple(
+            rl.ParagraphStyle(f'List{level}', parent=body, alignment=rl.TA_LEFT, spaceAfter=4,
+                              leftIndent=18 * level, bulletIndent=18 * level - 12)
+            for level in range(1, 7)
+        )
+    )
+
+def iter_paragraphs(content):
+    """Yield the non-empty blank-line separated paragraphs of ``content`` lazily"""
+    start = 0
+    for match in re.finditer(r'\n\n', content):
+        para = content[start:match.start()].strip()
+        if para:
+            yield para
+        start = match.end()
+    para = content[start:].strip()
+    if para:
+        yield para
+
+# Manuscript parsing shared by every exporter
+# kind: heading, paragraph, list_item, quote, code or rule. ``text`` is plain
+# text (titles, word counts); ``spans`` are (text, marks, href) runs that each
+# exporter turns into its own markup; ``marker`` is a list item's bullet.
+Block = namedtuple('Block', ['kind', 'level', 'text', 'spans', 'marker'], defaults=((), None))
+_CHAPTER_HEADING = re.compile(r'^(chapter|part|prologue|epilogue|interlude)\b.{0,80}$', re.IGNORECASE)
+_FENCE = re.compile(r'^ {0,3}(```|~~~)', re.MULTILINE)
+_INLINE_MARKS = {'strong': 'b', 'em': 'i', 's': 'strike'}
+
+@functools.lru_cache(maxsize=1)
+def _markdown():
+    # Raw HTML stays literal text, and single newlines are kept as line breaks
+    from markdown_it import MarkdownIt
+    return MarkdownIt('commonmark', {'html': False, 'breaks': True}).enable('strikethrough')
+
+def iter_markdown_chunks(content):
+    """Yield paragraphs of ``content`` that can be parsed independently
+
+    Blank lines separate chunks, except inside fenced code blocks, which
+    are kept whole.
+    """
+    pending = None
+    for para in iter_paragraphs(content):
+        pending = para if pending is None else pending + "\n\n" + para
+        if len(_FENCE.findall(pending)) % 2 == 0:
+            yield pending
+            pending = None
+    if pending is not None:
+        yield pending
+
+def _inline_spans(children):
+    spans = []
+    marks = []
+    href = None
+    for child in children:
+        if child.type == 'text':
+            spans.append((child.content, frozenset(marks), href))
+        elif child.type == 'code_inline':
+            spans.append((child.content, frozenset(marks + ['code']), href))
+        elif child.type in ('softbreak', 'hardbreak'):
+            spans.append(("\n", frozenset(), None))
+        elif child.type == 'image':
+            spans.append((child.content, frozenset(marks), href))
+        elif child.type == 'link_open':
+            href = child.attrGet('href')
+        elif child.type == 'link_close':
+            href = None
+        elif child.type.endswith('_open') and child.type[:-5] in _INLINE_MARKS:
+            marks.append(_INLINE_MARKS[child.type[:-5]])
+        elif child.type.endswith('_close') and child.type[:-6] in _INLINE_MARKS:
+            marks.remove(_INLINE_MARKS[child.type[:-6]])
+    return tuple(spans)
+
+@functools.lru_cache(maxsize=MARKDOWN_CACHE_PARAGRAPHS)
+def parse_chunk(chunk):
+    """Blocks for one paragraph of markdown, cached so edits only re-parse changed paragraphs"""
+    tokens = _markdown().parse(chunk)
+    blocks = []
+    lists = []  # [ordered, next number] per open list
+    quotes = 0
+    marker = None
+    for index, token in enumerate(tokens):
+        if token.type in ('bullet_list_open', 'ordered_list_open'):
+            lists.append([token.type == 'ordered_list_open', int(token.attrGet('start') or 1)])
+        elif token.type in ('bullet_list_close', 'ordered_list_close'):
+            lists.pop()
+        elif token.type == 'list_item_open':
+            ordered, number = lists[-1]
+            marker = f"{number}." if ordered else "•"
+            lists[-1][1] += 1
+        elif token.type == 'blockquote_open':
+            quotes += 1
+        elif token.type == 'blockquote_close':
+            quotes -= 1
+        elif token.type in ('fence', 'code_block'):
+            code = token.content.rstrip("\n")
+            blocks.append(Block('code', 0, code, ((code, frozenset(['code']), None),)))
+        elif token.type == 'hr':
+            blocks.append(Block('rule', 0, ''))
+        elif token.type == 'inline':
+            spans = _inline_spans(token.children or ())
+            text = ''.join(span[0] for span in spans)
+            opener = tokens[index - 1]
+            if opener.type == 'heading_open':
+                blocks.append(Block('heading', int(opener.tag[1]), text, spans))
+            elif lists:
+                # Only an item's first paragraph carries the bullet
+                blocks.append(Block('list_item', len(lists), text, spans, marker))
+                marker = None
+            elif quotes:
+                blocks.append(Block('quote', quotes, text, spans))
+            elif _CHAPTER_HEADING.match(text) and "\n" not in text:
+                blocks.append(Block('heading', 1, text, spans))
+            else:
+                blocks.append(Block('paragraph', 0, text, spans))
+    return tuple(blocks)
+
+def iter_blocks(content):
+    """Parse ``content`` as markdown a paragraph at a time"""
+    for chunk in iter_markdown_chunks(content):
+        yield from parse_chunk(chunk)
+
+@functools.lru_cache(maxsize=4)
+def parse_manuscript(content):
+    """Tokenize ``content`` once so PDF and EPUB exports of it share the work"""
+    return tuple(iter_blocks(content))
+
+# Manuscript statistics, summed from per-paragraph counts
+_SENTENCE_END = re.compile(r'[.!?…]+["”’\')\]]*(?=\s|$)')
+
+@functools.lru_cache(maxsize=MARKDOWN_CACHE_PARAGRAPHS)
+def chunk_stats(chunk):
+    """(words, sentences, paragraphs, chapter title or None) for one markdown paragraph"""
+    words = sentences = paragraphs = 0
+    title = None
+    for block in parse_chunk(chunk):
+        count = len(block.text.split())
+        words += count
+        if block.kind == 'heading':
+            if block.level == 1 and title is None and paragraphs == 0:
+                title = block.text
+        elif block.kind in ('paragraph', 'list_item', 'quote') and count:
+            paragraphs += 1
+            sentences += len(_SENTENCE_END.findall(block.text)) or 1
+    return words, sentences, paragraphs, title
+
+def manuscript_stats(content):
+    """Word, sentence, paragraph and per-chapter counts plus reading time for ``content``
+
+    Counts come from cached per-paragraph results, so after an edit only
+    the changed paragraphs are parsed and counted again.
+    """
+    words = sentences = paragraphs = 0
+    chapters = []
+    for chunk in iter_markdown_chunks(content):
+        chunk_words, chunk_sentences, chunk_paragraphs, title = chunk_stats(chunk)
+        if title is not None or not chapters:
+            chapters.append({'title': title or 'Opening', 'words': 0})
+        chapters[-1]['words'] += chunk_words
+        words += chunk_words
+        sentences += chunk_sentences
+        paragraphs += chunk_paragraphs
+    return {
+        'words': words,
+        'characters': len(content),
+        'sentences': sentences,
+        'paragraphs': paragraphs,
+        'pages': max(1, words // WORDS_PER_PAGE),
+        'reading_minutes': words / READING_WORDS_PER_MINUTE,
+        'chapters': chapters
+    }
+
+# Inline markup: opening and closing tags per mark
+PDF_INLINE_TAGS = {
+    'b': ('<b>', '</b>'),
+    'i': ('<i>', '</i>'),
+    'strike': ('<strike>', '</strike>'),
+    'code': ('<font face="Courier">', '</font>')
+}
+XHTML_INLINE_TAGS = {
+    'b': ('<strong>', '</strong>'),
+    'i': ('<em>', '</em>'),
+    'strike': ('<del>', '</del>'),
+    'code': ('<code>', '</code>')
+}
+
+def render_spans(spans, tags, line_break, link_open='<a href="{href}">'):
+    """Escaped markup for a block's spans using ``tags`` for each mark"""
+    parts = []
+    for text, marks, href in spans:
+        piece = html.escape(text, quote=False).replace("\n", line_break)
+        for mark in sorted(marks):
+            opening, closing = tags[mark]
+            piece = opening + piece + closing
+        if href:
+            piece = link_open.format(href=html.escape(href)) + piece + '</a>'
+        parts.append(piece)
+    return ''.join(parts)
+
+def pdf_markup(block):
+    """ReportLab paragraph markup for a block"""
+    return render_spans(block.spans, PDF_INLINE_TAGS, '<br/>', '<a href="{href}" color="blue">')
+
+def iter_chapters(blocks, max_words=EPUB_CHAPTER_WORDS):
+    """Group blocks into (title, blocks) chapters at top-level headings or every ``max_words`` words"""
+    title, chapter, words = None, [], 0
+    for block in blocks:
+        opens_chapter = block.kind == 'heading' and block.level == 1
+        if chapter and (opens_chapter or words >= max_words):
+            yield title, chapter
+            title, chapter, words = None, [], 0
+        if opens_chapter and not chapter:
+            title = block.text
+        chapter.append(block)
+        words += len(block.text.split())
+    if chapter:
+        yield title, chapter
+
+def _pdf_story(content, metadata, styles, progress=None):
+    rl = _reportlab()
+    
+    # Title page
+    if metadata.get('title'):
+        yield rl.Paragraph(html.escape(metadata['title'], quote=False), styles.title)
+    
+    if metadata.get('author'):
+        yield rl.Paragraph(f"by {html.escape(metadata['author'], quote=False)}", styles.author)
+    
+    yield rl.Spacer(1, 50)
+    
+    # Content, laid out a block at a time as the layout engine asks for it
+    if content:
+        for count, block in enumerate(parse_manuscript(content), start=1):
+            if progress is not None:
+                progress(paragraphs=count)
+            if block.kind == 'heading':
+                yield rl.Paragraph(pdf_markup(block), styles.headings[min(block.level, 6) - 1])
+            elif block.kind == 'list_item':
+                yield rl.Paragraph(pdf_markup(block), styles.lists[min(block.level, 6) - 1],
+                                   bulletText=block.marker)
+            elif block.kind == 'quote':
+                yield rl.Paragraph(pdf_markup(block), styles.quote)
+            elif block.kind == 'code':
+                yield rl.Preformatted(block.text, styles.code)
+            elif block.kind == 'rule':
+                yield rl.HRFlowable(width='100%', spaceBefore=6, spaceAfter=12, color=rl.colors.grey)
+            else:
+                yield rl.Paragraph(pdf_markup(block), styles.body)
+                yield rl.Spacer(1, styles.body.fontSize)
+
+def create_pdf(content, metadata, output=None, on_page=None, progress=None, layout=DEFAULT_LAYOUT):
+    """Create PDF with enhanced formatting
+
+    Renders into ``output`` (a path or binary file object, by default a
+    temporary file that spills to disk past PDF_SPOOL_MAX_MEMORY) while the
+    story is generated lazily, with page size and styles from the ``layout``
+    entry in LAYOUTS. ``progress`` is called with ``paragraphs=`` and
+    ``pages=`` counts as the build advances. Returns the output and render
+    statistics.
+    """
+    if progress is not None:
+        page_hook = on_page
+
+        def on_page(pages):
+            progress(pages=pages)
+            if page_hook is not None:
+                page_hook(pages)
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)
+    rl = _reportlab()
+    page = LAYOUTS[layout]
+    left, right, top, bottom = page.margins
+    started = time.perf_counter()
+    doc = rl.StreamingDocTemplate(output, pagesize=page.page_size,
+                           leftMargin=left, rightMargin=right,
+                          topMargin=top, bottomMargin=bottom,
+                          on_page=on_page)
+    
+    styles = pdf_styles(layout)
+    doc.build(LazyFlowables(_pdf_story(content, metadata, styles, progress)))
+    
+    seconds = time.perf_counter() - started
+    if hasattr(output, 'seek'):
+        size = output.tell()
+        output.seek(0)
+    else:
+        size = os.path.getsize(output)
+    stats = {
+        'pages': doc.pages_emitted,
+        'seconds': seconds,
+        'pages_per_second': doc.pages_emitted / seconds if seconds else 0.0,
+        'bytes': size
+    }
+    return output, stats
+
+# EPUB export
+EPUB_STYLESHEET = """body { font-family: serif; line-height: 1.5; }
+h1, h2, h3 { text-align: center; }
+p { text-indent: 1.5em; margin: 0 0 0.6em 0; text-align: justify; }
+p.item { text-indent: -1.2em; text-align: left; }
+blockquote { margin: 0.6em 2em; font-style: italic; }
+pre { font-size: 0.85em; white-space: pre-wrap; }
+"""
+
+@functools.lru_cache(maxsize=None)
+def epub_stylesheet(layout_name):
+    """EPUB CSS for a layout: the shared rules scaled to the layout's body size"""
+    scale = LAYOUTS[layout_name].font_size / 12
+    return EPUB_STYLESHEET + f"html {{ font-size: {scale * 100:.0f}%; }}\n"
+
+def render_chapter_html(blocks):
+    """XHTML body for one chapter's blocks"""
+    parts = []
+    for block in blocks:
+        if block.kind == 'code':
+            parts.append(f"<pre><code>{html.escape(block.text, quote=False)}</code></pre>")
+            continue
+        if block.kind == 'rule':
+            parts.append("<hr/>")
+            continue
+        markup = render_spans(block.spans, XHTML_INLINE_TAGS, '<br/>')
+        if block.kind == 'heading':
+            level = min(block.level, 6)
+            parts.append(f"<h{level}>{markup}</h{level}>")
+        elif block.kind == 'list_item':
+            marker = html.escape(block.marker) + " " if block.marker else ""
+            parts.append(f'<p class="item" style="margin-left: {1.5 * block.level:.1f}em">{marker}{markup}</p>')
+        elif block.kind == 'quote':
+            parts.append(f"<blockquote><p>{markup}</p></blockquote>")
+        else:
+            parts.append(f"<p>{markup}</p>")
+    return "\n".join(parts)
+
+@functools.lru_cache(maxsize=None)
+def _ebooklib():
+    """ebooklib, imported on the first EPUB export rather than at startup"""
+    from ebooklib import epub
+
+    class LazyEpubChapter(epub.EpubHtml):
+        """EPUB chapter whose XHTML is only built while the archive writer stores it"""
+
+        def __init__(self, blocks, on_render=None, **kwargs):
+            super().__init__(**kwargs)
+            self.blocks = blocks
+            self.on_render = on_render
+
+        def get_content(self, default=None):
+            if self.on_render is not None:
+                self.on_render()
+            self.content = render_chapter_html(self.blocks)
+            try:
+                return super().get_content(default)
+            finally:
+                self.content = b''
+
+    return SimpleNamespace(epub=epub, LazyEpubChapter=LazyEpubChapter)
+
+def create_epub(content, metadata, output, progress=None, layout=DEFAULT_LAYOUT):
+    """Create an EPUB at ``output``, one chapter per heading or EPUB_CHAPTER_WORDS words
+
+    Chapters keep references to the shared parsed blocks; each chapter's
+    markup is rendered and compressed into the archive in turn, so only one
+    chapter's XHTML exists at a time. ``progress`` is called with
+    ``paragraphs=`` counts as chapters are written. Text reflows, so only
+    the ``layout``'s type size applies. Returns the output and statistics.
+    """
+    ebooklib = _ebooklib()
+    epub = ebooklib.epub
+    started = time.perf_counter()
+    title = metadata.get('title') or 'Book Buddy Recording'
+    
+    book = epub.EpubBook()
+    book.set_identifier(f"urn:uuid:{uuid.uuid4()}")
+    book.set_title(title)
+    book.set_language('en')
+    if metadata.get('author'):
+        book.add_author(metadata['author'])
+    
+    stylesheet = epub.EpubItem(uid="style", file_name="style/book.css",
+                               media_type="text/css", content=epub_stylesheet(layout))
+    book.add_item(stylesheet)
+    
+    chapters = []
+    written = 0
+    blocks = parse_manuscript(content) if content else ()
+    for number, (chapter_title, chapter_blocks) in enumerate(iter_chapters(blocks), start=1):
+        written += len(chapter_blocks)
+        chapter = ebooklib.LazyEpubChapter(
+            chapter_blocks,
+            on_render=functools.partial(progress, paragraphs=written) if progress is not None else None,
+            uid=f"chapter_{number}",
+            file_name=f"chapter_{number:04d}.xhtml",
+            title=chapter_title or (title if number == 1 else f"Part {number}"),
+            lang='en'
+        )
+        chapter.add_item(stylesheet)
+        book.add_item(chapter)
+        chapters.append(chapter)
+    
+    book.toc = chapters
+    book.spine = ['nav'] + chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    # No page-list: building one would render every chapter a second time
+    epub.write_epub(output, book, {'raise_exceptions': True, 'epub3_pages': False})
+    
+    seconds = time.perf_counter() - started
+    stats = {
+        'chapters': len(chapters),
+        'seconds': seconds,
+        'bytes': os.path.getsize(output)
+    }
+    return output, stats
+
+# Render jobs run in worker processes
+RENDERERS = {
+    'pdf': create_pdf,
+    'epub': create_epub
+}
+RENDERER_VERSIONS = {
+    'pdf': PDF_RENDERER_VERSION,
+    'epub': EPUB_RENDERER_VERSION
+}
+
+class RenderCancelled(Exception):
+    """Raised inside a worker when its render job has been cancelled"""
+
+class ProgressReporter:
+    """Forward a worker's render progress to the app and honour cancellation
+
+    Counts are sent and the job's cancel flag (a Manager proxy, so an IPC
+    round-trip) is checked at most every ``interval`` seconds, so a long
+    build neither floods the queue nor waits on the manager per paragraph.
+    A cancelled render stops at the next check.
+    """
+
+    def __init__(self, job_id, updates, cancelled, interval=0.25):
+        self.job_id = job_id
+        self.updates = updates
+        self.cancelled = cancelled
+        self.interval = interval
+        self.counts = {}
+        self._sent_at = 0.0
+
+    def __call__(self, **counts):
+        self.counts.update(counts)
+        now = time.monotonic()
+        if now - self._sent_at >= self.interval:
+            self._sent_at = now
+            if self.cancelled.is_set():
+                raise RenderCancelled()
+            self.updates.put((self.job_id, dict(self.counts)))
+
+    def flush(self):
+        self.updates.put((self.job_id, dict(self.counts)))
+
+def run_render_job(job_id, kind, content, metadata, output, updates, cancelled, options=None):
+    """Worker process entry point: render one document to ``output`` and return its stats
+
+    ``options`` are passed to the renderer as keyword arguments (e.g. ``layout``).
+    """
+    if cancelled.is_set():
+        raise RenderCancelled()
+    progress = ProgressReporter(job_id, updates, cancelled)
+    progress.flush()  # tells the app the job has left the queue
+    _, stats = RENDERERS[kind](content, metadata, output=output, progress=progress, **(options or {}))
+    progress.flush()
+    return stats
@@ -0,0 +1,97 @@
+"""Shared fixtures. app.py reads its storage paths from the environment at
+import time, so they are pointed at a scratch directory before any test
+module imports it."""
+import http.server
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix="book_buddy_tests_")
+os.environ.update({
+    'BOOKBUDDY_OUTBOX_PATH': os.path.join(SCRATCH, 'outbox.sqlite3'),
+    'BOOKBUDDY_OUTBOX_REPLAY_INTERVAL': '3600',
+    'BOOKBUDDY_INGEST_DIR': os.path.join(SCRATCH, 'uploads'),
+    'BOOKBUDDY_EXPORT_DIR': os.path.join(SCRATCH, 'exports'),
+    'BOOKBUDDY_ARTIFACT_CACHE_DIR': os.path.join(SCRATCH, 'artifacts'),
+    'BOOKBUDDY_METRICS_FILE': '',
+})
+sys.path.insert(0, ROOT)
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+class WebhookServer:
+    """Local webhook endpoint that records requests and answers with ``status``
+
+    Set ``respond`` to a function of (headers, body) returning (status, body)
+    to answer each request differently.
+    """
+
+    def __init__(self, ssl_context=None):
+        self.requests = []
+        self.status = 200
+        self.delay = 0.0
+        self.body = b'ok'
+        self.respond = None
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                server.requests.append((dict(self.headers), body))
+                if server.delay:
+                    threading.Event().wait(server.delay)
+                status, reply = (server.status, server.body) if server.respond is None else \
+                    server.respond(dict(self.headers), body)
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        scheme = 'http'
+        if ssl_context is not None:
+            self.httpd.socket = ssl_context.wrap_socket(self.httpd.socket, server_side=True)
+            scheme = 'https'
+        self.url = f"{scheme}://127.0.0.1:{self.httpd.server_port}/hook"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def webhook_server():
+    server = WebhookServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def tls_webhook_server(tmp_path):
+    """HTTPS webhook endpoint with a throwaway self-signed certificate; yields (server, CA file)"""
+    import ssl
+
+    if shutil.which('openssl') is None:
+        pytest.skip("openssl is needed to make a test certificate")
+    cert, key = str(tmp_path / 'cert.pem'), str(tmp_path / 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+         '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = WebhookServer(context)
+    yield server, cert
+    server.close()
@@ -0,0 +1,40 @@
+import os
+
+import app
+
+def rendered(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = app.ArtifactCache(str(tmp_path / 'cache'), max_bytes=10_000)
+    key = cache.key('pdf', 'text', {'title': 'T'})
+    assert cache.get(key, '.pdf') == (None, None)
+    cache.put(key, '.pdf', rendered(tmp_path, 'a.pdf', 100), {'pages': 1})
+    path, info = cache.get(key, '.pdf')
+    assert info == {'pages': 1} and os.path.getsize(path) == 100
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['files']) == (1, 1, 1)
+    assert stats['bytes'] > 100
+
+def test_eviction_removes_artifacts_with_their_sidecars(tmp_path):
+    cache = app.ArtifactCache(str(tmp_path / 'cache'), max_bytes=2500)
+    keys = [cache.key('pdf', str(number), {}) for number in range(3)]
+    for number, key in enumerate(keys):
+        cache.put(key, '.pdf', rendered(tmp_path, f'{number}.pdf', 1000), {'number': number})
+        # eviction orders by mtime, so keep the insertion order visible
+        for name in os.listdir(cache.directory):
+            if name.startswith(key):
+                os.utime(os.path.join(cache.directory, name), (number, number))
+    names = os.listdir(cache.directory)
+    assert not any(name.startswith(keys[0]) for name in names)
+    assert sorted(names) == sorted(f'{key}{suffix}' for key in keys[1:] for suffix in ('.pdf', '.json'))
+
+def test_half_an_entry_is_a_miss_and_is_cleaned_up(tmp_path):
+    cache = app.ArtifactCache(str(tmp_path / 'cache'))
+    key = cache.key('epub', 'text', {})
+    cache.put(key, '.epub', rendered(tmp_path, 'a.epub', 10), {})
+    os.remove(os.path.join(cache.directory, key + '.json'))
+    assert cache.get(key, '.epub') == (None, None)
+    assert os.listdir(cache.directory) == []
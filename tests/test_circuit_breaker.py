@@ -0,0 +1,90 @@
+import threading
+
+import app
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+def test_opens_after_consecutive_failures():
+    breaker = app.CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_in() <= 60
+
+def test_success_resets_the_failure_count():
+    breaker = app.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED
+
+def test_half_open_lets_one_probe_through():
+    breaker = app.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # the probe has not reported back yet
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow()
+
+def test_failed_probe_opens_again():
+    breaker = app.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    trip(breaker)
+    breaker._opened_at -= 60
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+
+def test_only_the_probing_thread_releases_the_probe():
+    breaker = app.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    assert breaker.allow()
+    other = threading.Thread(target=breaker.release_probe)
+    other.start()
+    other.join()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+def test_probe_is_released_when_the_body_cannot_be_built():
+    url = 'http://127.0.0.1:9/unbuildable'
+    breaker = app.get_circuit_breakers().get(url)
+    breaker.reset_timeout = 0
+    trip(breaker)
+    success, _, data = app.deliver_webhook(url, {'title': 'T'}, object(), 'binary',
+                                           dedup=app.DedupPolicy(skip_duplicates=False, idempotency_key=False))
+    assert not success and data['attempts'] == 0
+    assert breaker.allow()
+
+def test_registry_returns_one_breaker_per_url():
+    registry = app.CircuitBreakerRegistry()
+    assert registry.get('https://a/hook') is registry.get('https://a/hook')
+    assert registry.get('https://a/hook') is not registry.get('https://b/hook')
+
+def test_registry_drops_idle_breakers_first():
+    registry = app.CircuitBreakerRegistry(max_breakers=3)
+    failing = registry.get('https://failing/hook')
+    failing.record_failure()
+    for number in range(10):
+        registry.get(f'https://idle-{number}/hook')
+    assert len(registry) == 3
+    assert registry.get('https://failing/hook') is failing
+    assert registry.get('https://idle-9/hook') is not None
+
+def test_registry_drops_the_least_recently_used_when_all_hold_state():
+    registry = app.CircuitBreakerRegistry(max_breakers=2)
+    for name in ('a', 'b'):
+        registry.get(f'https://{name}/hook').record_failure()
+    registry.get('https://a/hook')  # a is now the most recently used
+    registry.get('https://c/hook').record_failure()
+    assert len(registry) == 2
+    assert registry.get('https://a/hook')._failures == 1
+    assert registry.get('https://b/hook')._failures == 0  # b was dropped and starts over
@@ -0,0 +1,61 @@
+import gzip
+import json
+import types
+
+import app
+
+GZIP = app.CompressionPolicy('gzip', level=6, threshold=0)
+NO_DEDUP = app.DedupPolicy(skip_duplicates=False, idempotency_key=False)
+
+def answer(status, text='', headers=None):
+    return types.SimpleNamespace(status_code=status, text=text, headers=headers or {})
+
+def test_rejects_encoding():
+    assert app.rejects_encoding(answer(415), 'gzip')
+    assert app.rejects_encoding(answer(400, 'unsupported content-encoding'), 'gzip')
+    assert app.rejects_encoding(answer(400, 'cannot gunzip: gzip header invalid'), 'gzip')
+    assert app.rejects_encoding(answer(400, headers={'Accept-Encoding': 'identity, br'}), 'gzip')
+    assert not app.rejects_encoding(answer(400, 'title is required'), 'gzip')
+    assert not app.rejects_encoding(answer(400, headers={'Accept-Encoding': 'gzip'}), 'gzip')
+    assert not app.rejects_encoding(answer(500, 'gzip'), 'gzip')
+
+def test_small_bodies_are_not_compressed():
+    headers = {}
+    policy = app.CompressionPolicy('gzip', threshold=1024)
+    assert policy.apply(b'{}', headers, {}) == b'{}'
+    assert 'Content-Encoding' not in headers
+
+def test_rejected_encoding_is_resent_plain_and_remembered(webhook_server):
+    def respond(headers, body):
+        if headers.get('Content-Encoding'):
+            return 415, b'unsupported media type'
+        return 200, b'ok'
+
+    webhook_server.respond = respond
+    # The plain resend does not use up a retry, so it happens even with a single attempt allowed
+    success, _, data = app.deliver_webhook(webhook_server.url, {'title': 'T'}, compression=GZIP, dedup=NO_DEDUP,
+                                           retry_policy=app.RetryPolicy(max_attempts=1))
+    assert success
+    assert data['content_encoding'] == 'identity'
+    assert data['attempts'] == 2
+    compressed, plain = webhook_server.requests
+    assert json.loads(gzip.decompress(compressed[1])) == json.loads(plain[1])
+    assert webhook_server.url in app.get_encoding_rejections()
+    assert app.get_circuit_breakers().get(webhook_server.url).state == app.CircuitBreaker.CLOSED
+
+    # Later sends to that URL skip compression altogether
+    app.deliver_webhook(webhook_server.url, {'title': 'Again'}, compression=GZIP, dedup=NO_DEDUP)
+    assert 'Content-Encoding' not in webhook_server.requests[2][0]
+
+def test_ordinary_400_is_not_a_compression_rejection(webhook_server):
+    webhook_server.status = 400
+    webhook_server.body = b'{"error": "title is required"}'
+    success, _, data = app.deliver_webhook(webhook_server.url, {'title': ''}, compression=GZIP, dedup=NO_DEDUP)
+    assert not success and data['status_code'] == 400
+    assert len(webhook_server.requests) == 1
+    assert webhook_server.url not in app.get_encoding_rejections()
+
+def test_rejections_expire():
+    rejections = app.EncodingRejections(ttl=0)
+    rejections.add('https://a/hook')
+    assert 'https://a/hook' not in rejections
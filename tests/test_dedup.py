@@ -0,0 +1,69 @@
+import io
+import os
+import time
+
+import app
+
+def wait_for(dispatcher, job_id, timeout=10):
+    job = dispatcher.get(job_id)
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job {job_id} did not finish"
+        time.sleep(0.05)
+    return job
+
+def test_key_depends_on_url_audio_and_metadata():
+    digest = app.audio_digest(io.BytesIO(b'audio'))
+    key = app.delivery_key('https://a/hook', digest, {'title': 'One', 'timestamp': '1'})
+    assert key == app.delivery_key('https://a/hook', digest, {'title': 'One', 'timestamp': '2'})
+    assert key != app.delivery_key('https://a/hook', digest, {'title': 'Two'})
+    assert key != app.delivery_key('https://b/hook', digest, {'title': 'One'})
+    assert key != app.delivery_key('https://a/hook', app.audio_digest(io.BytesIO(b'other')), {'title': 'One'})
+
+def test_key_ignores_transcoding_report():
+    digest = app.audio_digest(io.BytesIO(b'audio'))
+    assert app.delivery_key('u', digest, {'title': 'T', 'transcoded': {'seconds': 1.2}}) == \
+        app.delivery_key('u', digest, {'title': 'T', 'transcoded': {'seconds': 3.4}})
+
+def test_changed_metadata_is_sent_again(webhook_server):
+    audio = os.urandom(2000)
+    policy = app.DedupPolicy(skip_duplicates=True, idempotency_key=True)
+    first = app.deliver_webhook(webhook_server.url, {'title': 'Draft'}, io.BytesIO(audio), 'json', dedup=policy)
+    fixed = app.deliver_webhook(webhook_server.url, {'title': 'Final'}, io.BytesIO(audio), 'json', dedup=policy)
+    repeat = app.deliver_webhook(webhook_server.url, {'title': 'Final'}, io.BytesIO(audio), 'json', dedup=policy)
+    assert first[0] and fixed[0] and repeat[0]
+    assert not fixed[2].get('deduplicated')
+    assert repeat[2].get('deduplicated')
+    assert len(webhook_server.requests) == 2
+
+def test_failed_delivery_is_not_remembered(webhook_server):
+    audio = os.urandom(2000)
+    policy = app.DedupPolicy(skip_duplicates=True, idempotency_key=False)
+    webhook_server.status = 500
+    failed = app.deliver_webhook(webhook_server.url, {}, io.BytesIO(audio), 'json', app.RetryPolicy(max_attempts=1),
+                                 dedup=policy)
+    webhook_server.status = 200
+    retried = app.deliver_webhook(webhook_server.url, {}, io.BytesIO(audio), 'json', dedup=policy)
+    assert not failed[0]
+    assert retried[0] and not retried[2].get('deduplicated')
+
+def test_transcoded_resend_is_a_duplicate(webhook_server):
+    runs = []
+
+    def transcode(payload, audio_file):
+        # Like ffmpeg's muxer: different bytes and timing on every run
+        runs.append(1)
+        encoded = io.BytesIO(os.urandom(500))
+        return dict(payload, transcoded={'seconds': len(runs) * 0.37}), encoded
+
+    dispatcher = app.WebhookDispatcher(workers=1)
+    policy = app.DedupPolicy(skip_duplicates=True, idempotency_key=True)
+    audio = os.urandom(4000)
+    results = []
+    for _ in range(2):
+        job_id = dispatcher.submit(webhook_server.url, {'title': 'Chapter'}, io.BytesIO(audio), 'json',
+                                   prepare=transcode, dedup=policy)
+        results.append(wait_for(dispatcher, job_id).result)
+    assert results[0][0] and not results[0][2].get('deduplicated')
+    assert results[1][2].get('deduplicated')
+    assert len(webhook_server.requests) == 1
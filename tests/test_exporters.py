@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+import exporters
+
+def counting(items):
+    pulled = []
+
+    def generate():
+        for item in items:
+            pulled.append(item)
+            yield item
+
+    return generate(), pulled
+
+def test_lazy_flowables_materialise_only_the_lookahead():
+    source, pulled = counting(range(1000))
+    story = exporters.LazyFlowables(source, lookahead=8)
+    assert len(story) == 8
+    assert story[0] == 0 and story[3] == 3
+    assert len(pulled) == 8
+
+def test_lazy_flowables_behave_like_a_list_at_the_front():
+    source, _ = counting(range(10))
+    story = exporters.LazyFlowables(source, lookahead=4)
+    del story[0]
+    story.insert(0, 'split')
+    story[1] = 'replaced'
+    assert story[0:3] == ['split', 'replaced', 2]
+    consumed = []
+    while len(story):
+        consumed.append(story[0])
+        del story[0]
+    assert consumed == ['split', 'replaced'] + list(range(2, 10))
+
+def test_lazy_flowables_refuse_indexing_from_the_end():
+    story = exporters.LazyFlowables(iter(range(3)))
+    with pytest.raises(IndexError):
+        story[-1]
+    with pytest.raises(IndexError):
+        story[1:]
+
+def test_pdf_built_lazily_matches_a_list_build():
+    content = "\n\n".join(f"# Chapter {n}\n\n" + "A line of prose. " * 80 for n in range(1, 30))
+    lazy, stats = exporters.create_pdf(content, {'title': 'Lazy', 'author': 'Tester'}, output=io.BytesIO())
+    rl = exporters._reportlab()
+    eager = io.BytesIO()
+    doc = rl.StreamingDocTemplate(eager, pagesize=exporters.LAYOUTS[exporters.DEFAULT_LAYOUT].page_size)
+    styles = exporters.pdf_styles(exporters.DEFAULT_LAYOUT)
+    doc.build(list(exporters._pdf_story(content, {'title': 'Lazy', 'author': 'Tester'}, styles)))
+    assert stats['pages'] > 10
+    assert stats['pages'] == doc.pages_emitted
@@ -0,0 +1,53 @@
+import builtins
+import os
+
+import pytest
+
+import app
+from conftest import WebhookServer
+
+@pytest.fixture
+def second_webhook_server():
+    server = WebhookServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def opened_files(monkeypatch):
+    """Every file app.py opens during the test"""
+    files = []
+
+    def tracking_open(*args, **kwargs):
+        f = builtins.open(*args, **kwargs)
+        files.append(f)
+        return f
+
+    monkeypatch.setattr(app, 'open', tracking_open, raising=False)
+    return files
+
+@pytest.fixture
+def disk_audio(tmp_path):
+    path = tmp_path / 'take.webm'
+    path.write_bytes(os.urandom(4096))
+    with open(path, 'rb') as f:
+        yield f
+
+@pytest.mark.parametrize('transport', ['binary', 'multipart', 'json'])
+def test_fan_out_closes_audio_reopened_for_each_endpoint(webhook_server, second_webhook_server, opened_files,
+                                                        disk_audio, transport):
+    results = app.fan_out_webhook([webhook_server.url, second_webhook_server.url], {'title': 'T'}, disk_audio,
+                                  transport, dedup=app.DedupPolicy(skip_duplicates=False, idempotency_key=False))
+    assert [result[0] for result in results] == [True, True]
+    reopened = [f for f in opened_files if f.name == disk_audio.name]
+    assert reopened
+    assert all(f.closed for f in reopened)
+    assert not disk_audio.closed  # the caller's file stays the caller's
+
+def test_endpoint_closes_its_reader_only_on_exit(disk_audio):
+    body = app.SharedRequestBody({'title': 'T'}, disk_audio, 'binary')
+    with body.endpoint() as endpoint_body:
+        request_kwargs, _, _, _ = endpoint_body.build({}, None)
+        request_kwargs['data'].rewind()
+        assert request_kwargs['data'].read(16)  # still readable while the endpoint sends
+        opened = endpoint_body.build.keywords['opened']
+    assert opened and all(f.closed for f in opened)
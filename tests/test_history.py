@@ -0,0 +1,26 @@
+import io
+import os
+
+import app
+
+def test_duplicate_rows_show_no_attempts(webhook_server):
+    audio = os.urandom(2000)
+    policy = app.DedupPolicy(skip_duplicates=True, idempotency_key=False)
+    sent = app.deliver_webhook(webhook_server.url, {'title': 'Once'}, io.BytesIO(audio), 'json', dedup=policy)
+    repeat = app.deliver_webhook(webhook_server.url, {'title': 'Once'}, io.BytesIO(audio), 'json', dedup=policy)
+    sent_row = app.history_row(app.DeliveryRecord(sent[2]))
+    repeat_row = app.history_row(app.DeliveryRecord(repeat[2]))
+    assert sent_row['Attempts'] == 1
+    assert repeat_row['Result'] == '♻️ duplicate'
+    assert repeat_row['Attempts'] == 0
+
+def test_retries_are_counted(webhook_server):
+    webhook_server.status = 503
+    policy = app.RetryPolicy(max_attempts=3, backoff_base=0.01)
+    result = app.deliver_webhook(webhook_server.url, {'title': 'Retry'}, retry_policy=policy,
+                                 dedup=app.DedupPolicy(skip_duplicates=False, idempotency_key=False))
+    assert app.history_row(app.DeliveryRecord(result[2]))['Attempts'] == 3
+
+def test_browser_sends_count_as_one_attempt():
+    record = app.DeliveryRecord({'success': True, 'status_code': 200, 'source': 'browser_recorder'})
+    assert app.history_row(record)['Attempts'] == 1
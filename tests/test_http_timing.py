@@ -0,0 +1,30 @@
+import time
+
+import app
+
+def test_https_timing_splits_connect_tls_and_ttfb(tls_webhook_server, monkeypatch):
+    import urllib3.util.connection
+
+    server, cafile = tls_webhook_server
+    server.delay = 0.2
+    create_connection = urllib3.util.connection.create_connection
+
+    def slow_connect(*args, **kwargs):
+        time.sleep(0.1)
+        return create_connection(*args, **kwargs)
+
+    monkeypatch.setattr(urllib3.util.connection, 'create_connection', slow_connect)
+    response = app.WebhookSessionPool().post(server.url, data=b'{}', timeout=10, verify=cafile)
+
+    timing = response.timing
+    assert response.status_code == 200
+    assert 0.1 <= timing['connect'] < 0.2
+    # The handshake with a local server is quick; it must not absorb the connect time
+    assert timing['tls'] < 0.1
+    assert 0.2 <= timing['ttfb'] < 0.3
+
+def test_plain_http_has_no_tls_phase(webhook_server):
+    response = app.WebhookSessionPool().post(webhook_server.url, data=b'{}', timeout=10)
+    assert 'connect' in response.timing
+    assert 'tls' not in response.timing
+    assert response.timing['ttfb'] >= 0
@@ -0,0 +1,117 @@
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import app
+
+class RecordingDispatcher:
+    """Stands in for WebhookDispatcher and keeps what it was asked to send"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, url, payload, audio, transport, label, retry_policy, outbox_id=None, extra_urls=()):
+        self.submitted.append((url, payload, audio.getvalue(), outbox_id))
+        return f"job-{len(self.submitted)}"
+
+@pytest.fixture
+def ingest(tmp_path):
+    outbox = app.WebhookOutbox(str(tmp_path / 'outbox.sqlite3'))
+    ingest = app.RecordingIngest(RecordingDispatcher(), outbox, spool_dir=str(tmp_path / 'spool'))
+    ticket = ingest.register(url='http://127.0.0.1:9/hook', transport='json', max_attempts=1, owner='tester')
+    return ingest, ticket
+
+@pytest.fixture
+def ingest_server(ingest):
+    recording_ingest, ticket = ingest
+    handler = type('TestIngestHandler', (app.IngestRequestHandler,), {'ingest': recording_ingest})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port, recording_ingest, ticket
+    server.shutdown()
+    server.server_close()
+
+def post_complete(port, ticket, body):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.request('POST', f'/uploads/{ticket}/recording-01/complete', body=body,
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = json.loads(response.read())
+    conn.close()
+    return response.status, data
+
+def test_complete_joins_segments_in_order(ingest):
+    recording_ingest, ticket = ingest
+    for seq, chunk in [(1, b'world'), (0, b'hello ')]:
+        recording_ingest.store_segment(ticket, 'recording-01', seq, chunk)
+    job_id, size = recording_ingest.complete(ticket, 'recording-01', 2, {'title': 'Chapter 1'})
+    assert job_id == 'job-1'
+    assert size == 11
+    _, payload, audio, _ = recording_ingest.dispatcher.submitted[0]
+    assert audio == b'hello world'
+    assert payload['segments'] == 2 and payload['upload_mode'] == 'chunked'
+    assert not os.path.exists(recording_ingest._recording_dir(ticket, 'recording-01'))
+
+def test_complete_refuses_missing_segments(ingest):
+    recording_ingest, ticket = ingest
+    recording_ingest.store_segment(ticket, 'recording-01', 0, b'a')
+    with pytest.raises(ValueError, match="Missing segments"):
+        recording_ingest.complete(ticket, 'recording-01', 2, {})
+
+@pytest.mark.parametrize('segments', [0, -1, True, '2', 2.0, None, app.INGEST_MAX_SEGMENTS + 1])
+def test_complete_rejects_bad_segment_counts(ingest, segments):
+    recording_ingest, ticket = ingest
+    with pytest.raises(ValueError, match="Segment count"):
+        recording_ingest.complete(ticket, 'recording-01', segments, {})
+    assert recording_ingest.dispatcher.submitted == []
+
+def test_complete_rejects_non_object_payload(ingest):
+    recording_ingest, ticket = ingest
+    recording_ingest.store_segment(ticket, 'recording-01', 0, b'a')
+    with pytest.raises(ValueError, match="Payload"):
+        recording_ingest.complete(ticket, 'recording-01', 1, ['title'])
+
+@pytest.mark.parametrize('body', [
+    b'{"segments": 0, "payload": {}}',
+    b'{"payload": {}}',
+    b'{"segments": [1], "payload": {}}',
+    b'{"segments": 1, "payload": "title"}',
+    b'{"segments": 1, "payload": null}',
+    b'[1, 2]',
+    b'not json',
+])
+def test_complete_route_answers_400_for_malformed_requests(ingest_server, body):
+    port, recording_ingest, ticket = ingest_server
+    recording_ingest.store_segment(ticket, 'recording-01', 0, b'a')
+    status, data = post_complete(port, ticket, body)
+    assert status == 400
+    assert 'error' in data
+    assert recording_ingest.dispatcher.submitted == []
+
+def test_complete_route_queues_a_valid_recording(ingest_server):
+    port, recording_ingest, ticket = ingest_server
+    recording_ingest.store_segment(ticket, 'recording-01', 0, b'a')
+    status, data = post_complete(port, ticket, json.dumps({'segments': 1, 'payload': {'title': 'T'}}))
+    assert status == 202
+    assert data == {'job_id': 'job-1', 'bytes': 1, 'queued': True}
+
+def test_complete_route_answers_404_for_unknown_tickets(ingest_server):
+    port, _, _ = ingest_server
+    status, _ = post_complete(port, 'no-such-ticket', b'{"segments": 1}')
+    assert status == 404
+
+def test_receiving_tracks_unfinished_recordings(ingest):
+    recording_ingest, ticket = ingest
+    assert not recording_ingest.receiving(ticket)
+    recording_ingest.store_segment(ticket, 'recording-01', 0, b'a')
+    assert recording_ingest.receiving(ticket)
+    assert not recording_ingest.receiving('other-ticket')
+    recording_ingest._recordings[(ticket, 'recording-01')]['updated'] -= 3600
+    assert not recording_ingest.receiving(ticket)  # abandoned uploads stop the polling
+    recording_ingest.store_segment(ticket, 'recording-01', 1, b'b')
+    recording_ingest.complete(ticket, 'recording-01', 2, {})
+    assert not recording_ingest.receiving(ticket)
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+import app
+
+@pytest.fixture
+def outbox(tmp_path):
+    return app.WebhookOutbox(str(tmp_path / 'outbox.sqlite3'))
+
+def failure(status=None, message="failed"):
+    return False, message, {} if status is None else {'status_code': status}
+
+def only_entry(outbox):
+    [entry] = outbox.entries()
+    return entry
+
+def test_delivered_entries_are_deleted(outbox):
+    entry_id = outbox.add('https://a/hook', {'title': 'T'}, b'audio', inflight=True)
+    outbox.settle(entry_id, (True, "ok", {'status_code': 200}))
+    assert outbox.count() == 0
+
+def test_failures_back_off_exponentially(outbox):
+    entry_id = outbox.add('https://a/hook', {'title': 'T'})
+    delays = []
+    for _ in range(3):
+        assert outbox.claim(entry_id) is not None
+        before = time.time()
+        outbox.settle(entry_id, failure(503, "Webhook returned status 503"))
+        entry = only_entry(outbox)
+        delays.append(entry['next_attempt_at'] - before)
+    assert entry['state'] == 'pending' and entry['attempts'] == 3
+    assert entry['last_error'] == "Webhook returned status 503"
+    for attempts, delay in enumerate(delays, start=1):
+        ceiling = min(app.OUTBOX_BACKOFF_MAX, app.OUTBOX_REPLAY_INTERVAL * 2 ** attempts)
+        assert ceiling / 2 - 1 <= delay <= ceiling
+
+def test_only_due_entries_are_claimed(outbox):
+    entry_id = outbox.add('https://a/hook', {'title': 'T'})
+    outbox.settle(entry_id, failure())  # connection errors carry no status and are retried
+    assert outbox.claim_due() is None
+    with outbox._connect() as db:
+        db.execute("UPDATE outbox SET next_attempt_at = 0")
+    claimed = outbox.claim_due()
+    assert claimed['id'] == entry_id and claimed['payload'] == {'title': 'T'}
+    assert outbox.claim_due() is None  # in flight now
+
+@pytest.mark.parametrize('status', [400, 404, 410, 422])
+def test_permanent_client_errors_are_dead_lettered(outbox, status):
+    entry_id = outbox.add('https://a/hook', {'title': 'T'})
+    outbox.settle(entry_id, failure(status))
+    entry = only_entry(outbox)
+    assert entry['state'] == 'dead' and entry['attempts'] == 1
+    with outbox._connect() as db:
+        db.execute("UPDATE outbox SET next_attempt_at = 0")
+    assert outbox.claim_due() is None
+    assert outbox.claim(entry_id) is not None  # a user can still resend it by hand
+
+@pytest.mark.parametrize('status', sorted(app.OUTBOX_RETRY_CLIENT_STATUSES))
+def test_retryable_client_errors_stay_pending(outbox, status):
+    entry_id = outbox.add('https://a/hook', {'title': 'T'})
+    outbox.settle(entry_id, failure(status))
+    assert only_entry(outbox)['state'] == 'pending'
+
+def test_restart_replays_entries_left_in_flight(outbox):
+    outbox.add('https://a/hook', {'title': 'T'}, inflight=True)
+    reopened = app.WebhookOutbox(outbox.path)
+    assert only_entry(reopened)['state'] == 'pending'
+
+def test_sessions_see_and_discard_only_their_own(outbox):
+    mine = outbox.add('https://a/hook', {'title': 'Mine'}, owner='me')
+    outbox.add('https://a/hook', {'title': 'Theirs'}, owner='them')
+    outbox.add('https://a/hook', {'title': 'Sending'}, owner='me', inflight=True)
+    assert [entry['id'] for entry in outbox.entries(owner='me')][0] == mine
+    assert outbox.count('me') == 2 and outbox.count('them') == 1
+    outbox.discard(owner='me')
+    assert outbox.count('me') == 1  # the in-flight entry is left to its sender
+    assert outbox.count('them') == 1
+    assert outbox.owner_of(mine) is None
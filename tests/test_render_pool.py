@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+import app
+
+@pytest.fixture(scope='module')
+def pool():
+    return app.RenderPool(workers=2, max_queue=4)
+
+def wait_for(pool, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = pool.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"render {job_id} did not finish")
+
+def test_formats_of_one_manuscript_share_a_worker(pool, tmp_path):
+    manuscript = "# Chapter 1\n\nIt was a dark and stormy night.\n\n# Chapter 2\n\nThe end."
+    pdf = pool.submit('pdf', manuscript, {'title': 'Storm'}, str(tmp_path / 'a.pdf'))
+    epub = pool.submit('epub', manuscript, {'title': 'Storm'}, str(tmp_path / 'a.epub'))
+    other = pool.submit('pdf', "A different book.", {'title': 'Other'}, str(tmp_path / 'b.pdf'))
+    assert pool.get(pdf).worker == pool.get(epub).worker
+    # A new manuscript goes to the idle worker rather than queueing behind the first
+    assert pool.get(other).worker != pool.get(pdf).worker
+    for job_id in (pdf, epub, other):
+        job = wait_for(pool, job_id)
+        assert job.status == 'done', job.error
+        assert job.result['stats']['bytes'] > 0
+
+def test_affinity_map_is_bounded(pool):
+    with pool._lock:
+        for number in range(20 * pool.workers):
+            pool._pick_worker(f"manuscript {number}")
+        assert len(pool._affinity) == 4 * pool.workers